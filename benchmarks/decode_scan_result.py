@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Compares decoding a nextK reply with the generated AccumuloProxy.Client against CellClient, into Cells
+and into a ColumnBatch.
+
+    export PYTHONPATH="."
+    python benchmarks/decode_scan_result.py [num_cells] [iterations]
+"""
+
+import sys
+import timeit
+
+from thrift.Thrift import TMessageType
+from thrift.transport import TTransport
+from thrift.protocol import TCompactProtocol, TBinaryProtocol
+
+from pyaccumulo import Cell, CellClient
+from pyaccumulo.proxy import AccumuloProxy
+from pyaccumulo.proxy.ttypes import Key, KeyValue, ScanResult
+
+def encode_reply(protocol_class, num_cells):
+    results = [KeyValue(Key(row="row_%08d"%i, colFamily="cf", colQualifier="cq_%d"%(i%10), colVisibility="", timestamp=1400000000000+i), "value_%d"%i)
+               for i in xrange(num_cells)]
+    buf = TTransport.TMemoryBuffer()
+    oprot = protocol_class(buf)
+    oprot.writeMessageBegin("nextK", TMessageType.REPLY, 0)
+    AccumuloProxy.nextK_result(success=ScanResult(results=results, more=True)).write(oprot)
+    oprot.writeMessageEnd()
+    return buf.getvalue()
+
+def generated(protocol_class, data):
+    client = AccumuloProxy.Client(protocol_class(TTransport.TMemoryBuffer(data)))
+    results = client.recv_nextK()
+    return [Cell(e.key.row, e.key.colFamily, e.key.colQualifier, e.key.colVisibility, e.key.timestamp, e.value) for e in results.results]
+
+def cells(protocol_class, data):
+    client = CellClient(protocol_class(TTransport.TMemoryBuffer(data)))
+    return client.recv_nextK_cells()[0]
+
+def columnar(protocol_class, data):
+    client = CellClient(protocol_class(TTransport.TMemoryBuffer(data)))
+    return client.recv_nextK_cells(columnar=True)[0]
+
+def run(num_cells=1000, iterations=20):
+    """ Returns a result record per protocol and decoder """
+    protocols = [("compact", TCompactProtocol.TCompactProtocol),
+                 ("binary", TBinaryProtocol.TBinaryProtocol),
+                 ("accelerated", TBinaryProtocol.TBinaryProtocolAccelerated)]
+
+    results = []
+    for name, protocol_class in protocols:
+        data = encode_reply(protocol_class, num_cells)
+        assert generated(protocol_class, data) == cells(protocol_class, data)
+        for label, decode in [("generated", generated), ("CellClient", cells), ("columnar", columnar)]:
+            secs = min(timeit.repeat(lambda: decode(protocol_class, data), number=iterations, repeat=3)) / iterations
+            results.append({"name": "decode_scan_result", "params": {"protocol": name, "decoder": label, "cells": num_cells},
+                            "cells_per_sec": num_cells / secs})
+    return results
+
+def main():
+    num_cells = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    for r in run(num_cells, iterations):
+        print "%-12s %-11s %10.0f cells/sec" % (r["params"]["protocol"], r["params"]["decoder"], r["cells_per_sec"])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Compares Mutation and CompactMutation: memory used per cell, and how fast an update call is encoded by the
+generated AccumuloProxy.Client and by ProxyClient.
+
+    export PYTHONPATH="."
+    python benchmarks/mutation_encoding.py [num_rows] [cells_per_row]
+"""
+
+import sys
+import timeit
+
+from thrift.transport import TTransport
+from thrift.protocol import TCompactProtocol, TBinaryProtocol
+
+from pyaccumulo import Mutation, CompactMutation, ProxyClient, _add_updates
+from pyaccumulo.proxy import AccumuloProxy
+
+def build(mutation_class, num_rows, cells_per_row):
+    muts = []
+    for i in xrange(num_rows):
+        m = mutation_class("row_%08d" % i)
+        for j in xrange(cells_per_row):
+            m.put(cf="cf", cq="cq_%d" % j, val="value_%d" % j)
+        muts.append(m)
+    return muts
+
+def bytes_per_cell(muts, cells):
+    """ Size of the containers holding the cells, the strings themselves are the same for both classes """
+    size = 0
+    for m in muts:
+        size += sys.getsizeof(m) + sys.getsizeof(m.__dict__)
+        if isinstance(m, CompactMutation):
+            size += sum(sys.getsizeof(column) for column in (m.cfs, m.cqs, m.cvs, m.tss, m.vals, m.deletes))
+        else:
+            size += sys.getsizeof(m.updates)
+            size += sum(sys.getsizeof(u) + sys.getsizeof(u.__dict__) for u in m.updates)
+    return float(size) / cells
+
+def encode(client_class, protocol_class, muts):
+    cells = {}
+    for m in muts:
+        _add_updates(cells, m)
+    client_class(protocol_class(TTransport.TMemoryBuffer())).send_update("writer", cells)
+
+def run(num_rows=1000, cells_per_row=10):
+    """ Returns result records for memory use, put() speed and update encoding speed """
+    cells = num_rows * cells_per_row
+    params = {"rows": num_rows, "cells_per_row": cells_per_row}
+    results = []
+
+    mutations = build(Mutation, num_rows, cells_per_row)
+    compact = build(CompactMutation, num_rows, cells_per_row)
+    for label, muts in [("Mutation", mutations), ("CompactMutation", compact)]:
+        results.append({"name": "mutation_memory", "params": dict(params, mutation=label), "bytes_per_cell": bytes_per_cell(muts, cells)})
+
+    for label, mutation_class in [("Mutation", Mutation), ("CompactMutation", CompactMutation)]:
+        secs = min(timeit.repeat(lambda: build(mutation_class, num_rows, cells_per_row), number=1, repeat=3))
+        results.append({"name": "mutation_put", "params": dict(params, mutation=label), "cells_per_sec": cells / secs})
+
+    protocols = [("compact", TCompactProtocol.TCompactProtocol),
+                 ("binary", TBinaryProtocol.TBinaryProtocol),
+                 ("accelerated", TBinaryProtocol.TBinaryProtocolAccelerated)]
+    runs = [("generated", AccumuloProxy.Client, mutations),
+            ("ProxyClient", ProxyClient, mutations),
+            ("ProxyClient", ProxyClient, compact)]
+    for name, protocol_class in protocols:
+        for label, client_class, muts in runs:
+            secs = min(timeit.repeat(lambda: encode(client_class, protocol_class, muts), number=1, repeat=3))
+            results.append({"name": "mutation_encoding",
+                            "params": dict(params, protocol=name, encoder=label, mutation=muts[0].__class__.__name__),
+                            "cells_per_sec": cells / secs})
+    return results
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cells_per_row = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    for r in run(num_rows, cells_per_row):
+        p = r["params"]
+        if r["name"] == "mutation_memory":
+            print "memory      %-15s %6.0f bytes/cell" % (p["mutation"], r["bytes_per_cell"])
+        elif r["name"] == "mutation_put":
+            print "put         %-15s %10.0f cells/sec" % (p["mutation"], r["cells_per_sec"])
+        else:
+            print "%-11s %-11s %-15s %10.0f cells/sec" % (p["protocol"], p["encoder"], p["mutation"], r["cells_per_sec"])
+
+if __name__ == '__main__':
+    main()
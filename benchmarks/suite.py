@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End-to-end client benchmarks against a LocalProxy, plus the encoding and decoding micro benchmarks, with
+the results written as JSON so runs can be compared.
+
+    export PYTHONPATH="."
+    python benchmarks/suite.py --output results.json [--baseline previous.json] [--cells 20000]
+
+The proxy stand-in runs in a child process so it does not share the interpreter lock with the client.
+Each result record has a name, the params it was run with and its measurements (cells_per_sec,
+mb_per_sec, ops_per_sec...).  With --baseline, each measurement is also printed as a change from the
+record with the same name and params in the earlier run.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import timeit
+
+from thrift import TSerialization
+from thrift.protocol import TCompactProtocol
+
+from pyaccumulo import Accumulo, Mutation, Range, following_key, _cell_size
+from pyaccumulo.iterators import SummingCombiner, RegExFilter, IntersectingIterator
+from pyaccumulo.local_proxy import LocalProxy
+from pyaccumulo.proxy.ttypes import Key, ScanOptions
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import decode_scan_result
+import mutation_encoding
+
+PROTOCOLS = ["compact", "binary", "accelerated"]
+BATCH_SIZES = [10, 100, 1000, 10000]
+# (cells per mutation, value bytes)
+MUTATION_SIZES = [(1, 10), (100, 100)]
+
+def _serve(protocol, pipe):
+    proxy = LocalProxy(protocol=protocol)
+    pipe.send(proxy.port)
+    proxy.serve()
+
+def start_proxy(protocol):
+    """ Starts a LocalProxy in a child process and returns (process, port) """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(protocol, child))
+    process.daemon = True
+    process.start()
+    return process, parent.recv()
+
+def ingest(conn, table, num_cells, cells_per_mutation, value_bytes):
+    value = "v" * value_bytes
+    muts = []
+    for i in xrange(num_cells // cells_per_mutation):
+        m = Mutation("row_%08d" % i)
+        for j in xrange(cells_per_mutation):
+            m.put(cf="cf", cq="cq_%04d" % j, val=value)
+        muts.append(m)
+    start = time.time()
+    wr = conn.create_batch_writer(table, buffer_size=1024*1024)
+    wr.add_mutations(muts)
+    wr.close()
+    return time.time() - start
+
+def bench_ingest(conn, protocol, num_cells):
+    results = []
+    for cells_per_mutation, value_bytes in MUTATION_SIZES:
+        table = "ingest_%d_%d" % (cells_per_mutation, value_bytes)
+        conn.create_table(table)
+        secs = ingest(conn, table, num_cells, cells_per_mutation, value_bytes)
+        cells = num_cells // cells_per_mutation * cells_per_mutation
+        nbytes = sum(_cell_size(c) for c in conn.scan(table, batchsize=1000))
+        results.append({"name": "ingest", "params": {"protocol": protocol, "cells": cells, "cells_per_mutation": cells_per_mutation, "value_bytes": value_bytes},
+                        "cells_per_sec": cells / secs, "mb_per_sec": nbytes / secs / 1e6})
+        conn.delete_table(table)
+    return results
+
+def bench_scan(conn, protocol, num_cells):
+    table = "scan"
+    conn.create_table(table)
+    ingest(conn, table, num_cells, 10, 20)
+    results = []
+    for batchsize in BATCH_SIZES:
+        start = time.time()
+        cells = list(conn.scan(table, batchsize=batchsize))
+        secs = time.time() - start
+        nbytes = sum(_cell_size(c) for c in cells)
+        results.append({"name": "scan", "params": {"protocol": protocol, "cells": len(cells), "batchsize": batchsize},
+                        "cells_per_sec": len(cells) / secs, "mb_per_sec": nbytes / secs / 1e6})
+    conn.delete_table(table)
+    return results
+
+def _ops_per_sec(fn, number):
+    return number / min(timeit.repeat(fn, number=number, repeat=3))
+
+def bench_keys():
+    to_range = lambda: Range(srow="row_00001000", scf="cf", sinclude=False, erow="row_00002000", einclude=True).to_range()
+    following = lambda: following_key(Key(row="row_00001000", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=1400000000000))
+    return [{"name": "range_to_range", "params": {}, "ops_per_sec": _ops_per_sec(to_range, 20000)},
+            {"name": "following_key", "params": {}, "ops_per_sec": _ops_per_sec(following, 20000)}]
+
+def bench_iterators():
+    iterators = [SummingCombiner(columns=[["cf", "count"]]), RegExFilter(row_regex="row_0000.*", cq_regex="cq_.*"),
+                 IntersectingIterator(terms=["apple", "banana", "cherry"])]
+    settings = lambda: [i.get_iterator_setting() for i in iterators]
+    options = ScanOptions(iterators=settings())
+    serialize = lambda: TSerialization.serialize(options, TCompactProtocol.TCompactProtocolFactory())
+    return [{"name": "iterator_settings", "params": {"iterators": len(iterators)}, "ops_per_sec": _ops_per_sec(settings, 5000)},
+            {"name": "iterator_serialization", "params": {"iterators": len(iterators)}, "ops_per_sec": _ops_per_sec(serialize, 5000)}]
+
+def run(protocols, num_cells):
+    results = []
+    for protocol in protocols:
+        process, port = start_proxy(protocol)
+        try:
+            conn = Accumulo(host="127.0.0.1", port=port, protocol=protocol)
+            results.extend(bench_scan(conn, protocol, num_cells))
+            results.extend(bench_ingest(conn, protocol, num_cells))
+            conn.close()
+        finally:
+            process.terminate()
+    results.extend(bench_keys())
+    results.extend(bench_iterators())
+    results.extend(decode_scan_result.run())
+    results.extend(mutation_encoding.run())
+    return results
+
+def _key(record):
+    return record["name"], tuple(sorted(record["params"].items()))
+
+def report(results, baseline=None):
+    previous = dict((_key(r), r) for r in baseline or [])
+    for r in results:
+        params = " ".join("%s=%s" % item for item in sorted(r["params"].items()))
+        for metric, value in sorted(r.items()):
+            if metric in ("name", "params"):
+                continue
+            line = "%-24s %-70s %14.1f %s" % (r["name"], params, value, metric)
+            old = previous.get(_key(r), {}).get(metric)
+            if old:
+                line += " (%+.1f%%)" % ((value - old) * 100.0 / old)
+            print line
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark-results.json", help="file the JSON results are written to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--cells", type=int, default=20000, help="cells written and scanned per end-to-end benchmark")
+    parser.add_argument("--protocols", default=",".join(PROTOCOLS), help="comma separated protocols to run the end-to-end benchmarks with")
+    args = parser.parse_args()
+
+    results = run(args.protocols.split(","), args.cells)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+
+    with open(args.output, "w") as f:
+        json.dump({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "platform": platform.platform(), "cells": args.cells, "results": results}, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
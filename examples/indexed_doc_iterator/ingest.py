@@ -63,7 +63,7 @@ if not conn.table_exists(table):
     print "Creating table: %s"%table
     conn.create_table(table)
 
-wr = conn.create_batch_writer(table)
+wr = conn.create_batch_writer(table, buffer_size=1024*1024)
 
 for indir in input_dirs:
     for root, subFolders, files in os.walk(indir):
@@ -15,21 +15,82 @@
 # limitations under the License.
 
 from thrift import Thrift
+from thrift import TSerialization
+from thrift.Thrift import TType, TMessageType, TApplicationException
 from thrift.transport import TSocket
 from thrift.transport import TTransport
+from thrift.transport.TTransport import TTransportException
 from thrift.protocol import TCompactProtocol
+from thrift.protocol import TBinaryProtocol
+try:
+    from thrift.protocol import fastbinary
+except ImportError:
+    fastbinary = None
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from pyaccumulo.proxy import AccumuloProxy
 from pyaccumulo.proxy.ttypes import ScanColumn, ColumnUpdate, ScanOptions, Key, BatchScanOptions, TimeType, WriterOptions, IteratorSetting
+from pyaccumulo.proxy.ttypes import UnknownScanner, UnknownWriter
 import pyaccumulo.proxy.ttypes
 
-from collections import namedtuple
+from collections import namedtuple, deque
+from itertools import izip, repeat
 from pyaccumulo.iterators import BaseIterator
+from pyaccumulo.metrics import RpcMetrics, LogExporter, CountingFramedTransport, instrumented_client_class
+from pyaccumulo.hooks import ScanInfo, TraceHooks, SlowOperationLogger
 
 from array import array
+from Queue import Queue, Full
+import base64
+import functools
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
 
 Cell = namedtuple("Cell", "row cf cq cv ts val")
 
+ColumnBatch = namedtuple("ColumnBatch", "rows cfs cqs cvs timestamps values")
+
+# array typecode for int64 timestamps when numpy is not installed
+_TS_TYPECODE = 'l' if array('l').itemsize == 8 else 'd'
+
+def _to_column_batch(cells):
+    """ Transposes a list of Cells into a ColumnBatch """
+    if cells:
+        return _column_batch(*zip(*cells))
+    return _column_batch((), (), (), (), (), ())
+
+def _column_batch(rows, cfs, cqs, cvs, timestamps, values):
+    """
+    Builds a ColumnBatch from its column sequences.  With numpy installed the columns are numpy arrays
+    (int64 timestamps, object arrays for the rest), otherwise lists with an array.array of timestamps.
+    """
+    if numpy is not None:
+        columns = [numpy.array(c, dtype=object) for c in (rows, cfs, cqs, cvs)]
+        return ColumnBatch(columns[0], columns[1], columns[2], columns[3],
+                           numpy.array(timestamps, dtype=numpy.int64), numpy.array(values, dtype=object))
+    return ColumnBatch(list(rows), list(cfs), list(cqs), list(cvs), array(_TS_TYPECODE, timestamps), list(values))
+
+def _batch_len(batch):
+    """ Number of entries in a list of Cells or a ColumnBatch """
+    if isinstance(batch, ColumnBatch):
+        return len(batch.rows)
+    return len(batch)
+
+def _batch_bytes(batch):
+    """ Size of the keys and values of a list of Cells or a ColumnBatch, see _cell_size() """
+    if isinstance(batch, ColumnBatch):
+        return sum(len(s or '') for column in (batch.rows, batch.cfs, batch.cqs, batch.cvs, batch.values) for s in column) + 8 * len(batch.rows)
+    return sum(_cell_size(c) for c in batch)
+
 def _get_scan_columns(cols):
     columns = None
     if cols:
@@ -66,6 +127,34 @@ def following_key(key):
         key.row = following_array(key.row)
     return key
 
+def _key_order(key):
+    """ Sort key for a proxy Key, a key with its trailing fields unset sorts before every key that extends it """
+    order = []
+    for part in (key.row, key.colFamily, key.colQualifier, key.colVisibility):
+        if part is None:
+            return tuple(order)
+        order.append(part)
+    if key.timestamp is not None:
+        order.append(-key.timestamp)
+    return tuple(order)
+
+def _resume_range(rng, key):
+    """ Returns the part of the proxy Range rng (None for everything) after key, or None if nothing is left """
+    start = following_key(Key(row=key.row, colFamily=key.colFamily, colQualifier=key.colQualifier, colVisibility=key.colVisibility, timestamp=key.timestamp))
+    stop = rng.stop if rng is not None else None
+    stop_inclusive = rng.stopInclusive if rng is not None else True
+    if stop is not None:
+        c = cmp(_key_order(start), _key_order(stop))
+        if c > 0 or (c == 0 and not stop_inclusive):
+            return None
+    return proxy.ttypes.Range(start=start, startInclusive=True, stop=stop, stopInclusive=stop_inclusive)
+
+def _range_start(rng):
+    k = rng.start
+    if k is None:
+        return (0,)
+    return (1, k.row or '', k.colFamily or '', k.colQualifier or '', k.colVisibility or '')
+
 class Mutation(object):
     def __init__(self, row):
         super(Mutation, self).__init__()
@@ -75,6 +164,105 @@ class Mutation(object):
     def put(self, cf='', cq='', cv=None, ts=None, val='', is_delete=None):
         self.updates.append(ColumnUpdate(colFamily=cf, colQualifier=cq, colVisibility=cv, timestamp=ts, value=val, deleteCell=is_delete))
 
+class CompactMutation(object):
+    """
+    Drop in replacement for Mutation that keeps its columns in parallel lists instead of one ColumnUpdate
+    object per put, and is encoded straight to the wire format by ProxyClient.send_update.
+    The updates attribute builds the equivalent ColumnUpdates on demand.
+
+    With protocol="accelerated" an update holding a CompactMutation is encoded in python rather than by the C
+    codec, so there Mutation writes several times faster and CompactMutation only saves memory.
+    """
+    def __init__(self, row):
+        super(CompactMutation, self).__init__()
+        self.row = row
+        self.cfs = []
+        self.cqs = []
+        self.cvs = []
+        self.tss = []
+        self.vals = []
+        self.deletes = []
+
+    def put(self, cf='', cq='', cv=None, ts=None, val='', is_delete=None):
+        self.cfs.append(cf)
+        self.cqs.append(cq)
+        self.cvs.append(cv)
+        self.tss.append(ts)
+        self.vals.append(val)
+        self.deletes.append(is_delete)
+
+    def __len__(self):
+        return len(self.cfs)
+
+    @property
+    def updates(self):
+        return [ColumnUpdate(colFamily=cf, colQualifier=cq, colVisibility=cv, timestamp=ts, value=val, deleteCell=d)
+                for cf, cq, cv, ts, val, d in zip(self.cfs, self.cqs, self.cvs, self.tss, self.vals, self.deletes)]
+
+def _add_updates(cells, mut):
+    """ Adds the updates of a Mutation or CompactMutation to a {row: [updates]} update map """
+    if isinstance(mut, CompactMutation):
+        cells.setdefault(mut.row, []).append(mut)
+    else:
+        cells.setdefault(mut.row, []).extend(mut.updates)
+
+def _has_compact_mutations(updates):
+    for u in updates:
+        if u.__class__ is CompactMutation:
+            return True
+    return False
+
+def _column_updates(updates):
+    """ Expands any CompactMutations in a list of updates into ColumnUpdates """
+    if not _has_compact_mutations(updates):
+        return updates
+    expanded = []
+    for u in updates:
+        if isinstance(u, CompactMutation):
+            expanded.extend(u.updates)
+        else:
+            expanded.append(u)
+    return expanded
+
+def _superseded(seen, cf, cq, cv, ts, is_delete):
+    key = (cf or '', cq or '', cv or '', ts)
+    if key in seen and (ts is None or not is_delete):
+        return True
+    seen.add(key)
+    return False
+
+def _coalesce_updates(updates):
+    """
+    Drops updates of a row that are superseded by a later update of the same column in the same list.
+    A later update without a timestamp replaces earlier ones without a timestamp, so only the last put or
+    delete of a column is sent.  With a timestamp only earlier puts with the same timestamp are dropped,
+    since a delete wins over a put with the same timestamp whatever order they are written in.
+    """
+    if len(updates) < 2 and not _has_compact_mutations(updates):
+        return updates
+    seen = set()
+    kept = []
+    for u in reversed(updates):
+        if u.__class__ is CompactMutation:
+            keep = [i for i in xrange(len(u) - 1, -1, -1)
+                    if not _superseded(seen, u.cfs[i], u.cqs[i], u.cvs[i], u.tss[i], u.deletes[i])]
+            if len(keep) == len(u):
+                kept.append(u)
+            elif keep:
+                keep.reverse()
+                m = CompactMutation(u.row)
+                m.cfs = [u.cfs[i] for i in keep]
+                m.cqs = [u.cqs[i] for i in keep]
+                m.cvs = [u.cvs[i] for i in keep]
+                m.tss = [u.tss[i] for i in keep]
+                m.vals = [u.vals[i] for i in keep]
+                m.deletes = [u.deletes[i] for i in keep]
+                kept.append(m)
+        elif not _superseded(seen, u.colFamily, u.colQualifier, u.colVisibility, u.timestamp, u.deleteCell):
+            kept.append(u)
+    kept.reverse()
+    return kept
+
 class Range(object):
     def __init__(self, 
                  srow=None, scf=None, scq=None, scv=None, sts=None, sinclude=True,
@@ -135,57 +323,1587 @@ class Range(object):
         return r
 
 
+def group_rows(cells, max_row_cells=None, truncate=False):
+    """
+    Groups consecutive Cells that share a row, yielding (row, [cells]) without buffering more than one row.
+    :param cells: an iterable of Cells sorted by row, e.g. the result of scan()
+    :param max_row_cells: most cells held for one row; longer rows are yielded as several consecutive
+                          groups of at most this many cells, or cut short if truncate is True
+    :param truncate: drop the cells of a row beyond max_row_cells instead of yielding another group
+    """
+    row = None
+    group = []
+    started = False
+    skipping = False
+    for cell in cells:
+        if not started or cell.row != row:
+            if group:
+                yield row, group
+            row = cell.row
+            group = []
+            skipping = False
+            started = True
+        if skipping:
+            continue
+        group.append(cell)
+        if max_row_cells and len(group) >= max_row_cells:
+            yield row, group
+            group = []
+            skipping = truncate
+    if group:
+        yield row, group
+
+class AdaptiveBatchSize(object):
+    """
+    Batch size for scan() and batch_scan() that adapts the number of entries requested per nextK call.
+    Starts at `initial` and grows by `growth` while full batches come back faster than `target_latency_ms`,
+    shrinks when a round trip is slower than that, and never asks for more entries than fit in `max_bytes`
+    given the average entry size seen so far.  Every size used is appended to `sizes`.
+    """
+    def __init__(self, initial=10, minimum=1, maximum=100000, max_bytes=4*1024*1024, target_latency_ms=250, growth=2):
+        super(AdaptiveBatchSize, self).__init__()
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_bytes = max_bytes
+        self.target_latency_ms = target_latency_ms
+        self.growth = growth
+        self.avg_cell_bytes = None
+        self.sizes = []
+
+    def next_batch(self, client, scanner, columnar=False):
+        size = self.size
+        start = time.time()
+        cells, more = _nextK(client, scanner, size, columnar)
+        latency_ms = (time.time() - start) * 1000
+        self.sizes.append(size)
+        self.update(size, cells, latency_ms)
+        return cells, more
+
+    def update(self, requested, cells, latency_ms):
+        n = _batch_len(cells)
+        if n:
+            self.avg_cell_bytes = float(_batch_bytes(cells)) / n
+
+        if latency_ms > self.target_latency_ms:
+            size = self.size // self.growth
+        elif n >= requested:
+            size = self.size * self.growth
+        else:
+            size = self.size
+
+        limit = self.maximum
+        if self.avg_cell_bytes:
+            limit = min(limit, int(self.max_bytes / self.avg_cell_bytes))
+        self.size = max(self.minimum, min(size, limit))
+
+def _cell_size(c):
+    return len(c.row or '') + len(c.cf or '') + len(c.cq or '') + len(c.cv or '') + 8 + len(c.val or '')
+
+class _Unexpected(Exception):
+    pass
+
+_I16 = struct.Struct("!h")
+_I32 = struct.Struct("!i")
+_I64 = struct.Struct("!q")
+_new_cell = tuple.__new__
+
+def _varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = ord(data[pos])
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+def _decode_compact_nextK_result(data, columnar=False):
+    """
+    Decodes a TCompactProtocol encoded nextK_result holding a ScanResult into (cells, more), or with columnar set
+    into (ColumnBatch, more) without building a Cell per entry.
+    Raises _Unexpected for anything else, e.g. a result carrying an exception.
+    """
+    cells = []
+    append = cells.append
+    if columnar:
+        rows, cfs, cqs, cvs, timestamps, values = [], [], [], [], [], []
+        add_row, add_cf, add_cq, add_cv, add_ts, add_val = rows.append, cfs.append, cqs.append, cvs.append, timestamps.append, values.append
+    more = None
+
+    # field 0 (success) can only use the long form header
+    if data[0:2] != "\x0c\x00":
+        raise _Unexpected()
+    pos = 2
+    fid = 0
+    while True:
+        b = ord(data[pos])
+        pos += 1
+        if b == 0:
+            break
+        if b < 0x10:
+            raise _Unexpected()
+        fid += b >> 4
+        ftype = b & 0x0f
+        if fid == 1 and ftype == 9:
+            b = ord(data[pos])
+            pos += 1
+            if b & 0x0f != 12:
+                raise _Unexpected()
+            size = b >> 4
+            if size == 15:
+                size, pos = _varint(data, pos)
+            for _ in xrange(size):
+                row = cf = cq = cv = ts = val = None
+                kv_fid = 0
+                while True:
+                    b = ord(data[pos])
+                    pos += 1
+                    if b == 0:
+                        break
+                    if b < 0x10:
+                        raise _Unexpected()
+                    kv_fid += b >> 4
+                    ftype = b & 0x0f
+                    if kv_fid == 1 and ftype == 12:
+                        key_fid = 0
+                        while True:
+                            b = ord(data[pos])
+                            pos += 1
+                            if b == 0:
+                                break
+                            if b < 0x10:
+                                raise _Unexpected()
+                            key_fid += b >> 4
+                            ftype = b & 0x0f
+                            if ftype == 8:
+                                n = ord(data[pos])
+                                if n < 0x80:
+                                    pos += 1
+                                else:
+                                    n, pos = _varint(data, pos)
+                                value = data[pos:pos+n]
+                                pos += n
+                                if key_fid == 1:
+                                    row = value
+                                elif key_fid == 2:
+                                    cf = value
+                                elif key_fid == 3:
+                                    cq = value
+                                elif key_fid == 4:
+                                    cv = value
+                                else:
+                                    raise _Unexpected()
+                            elif key_fid == 5 and ftype == 6:
+                                n, pos = _varint(data, pos)
+                                ts = (n >> 1) ^ -(n & 1)
+                            else:
+                                raise _Unexpected()
+                    elif kv_fid == 2 and ftype == 8:
+                        n = ord(data[pos])
+                        if n < 0x80:
+                            pos += 1
+                        else:
+                            n, pos = _varint(data, pos)
+                        val = data[pos:pos+n]
+                        pos += n
+                    else:
+                        raise _Unexpected()
+                if columnar:
+                    add_row(row)
+                    add_cf(cf)
+                    add_cq(cq)
+                    add_cv(cv)
+                    add_ts(ts)
+                    add_val(val)
+                else:
+                    append(_new_cell(Cell, (row, cf, cq, cv, ts, val)))
+        elif fid == 2 and ftype in (1, 2):
+            more = ftype == 1
+        else:
+            raise _Unexpected()
+
+    if data[pos] != "\x00":
+        raise _Unexpected()
+    if columnar:
+        return _column_batch(rows, cfs, cqs, cvs, timestamps, values), more
+    return cells, more
+
+def _decode_binary_nextK_result(data, columnar=False):
+    """
+    Decodes a TBinaryProtocol encoded nextK_result holding a ScanResult into (cells, more), or with columnar set
+    into (ColumnBatch, more) without building a Cell per entry.
+    Raises _Unexpected for anything else, e.g. a result carrying an exception.
+    """
+    i16 = _I16.unpack_from
+    i32 = _I32.unpack_from
+    cells = []
+    append = cells.append
+    if columnar:
+        rows, cfs, cqs, cvs, timestamps, values = [], [], [], [], [], []
+        add_row, add_cf, add_cq, add_cv, add_ts, add_val = rows.append, cfs.append, cqs.append, cvs.append, timestamps.append, values.append
+    more = None
+
+    if data[0:3] != "\x0c\x00\x00":
+        raise _Unexpected()
+    pos = 3
+    while True:
+        ftype = ord(data[pos])
+        if ftype == 0:
+            pos += 1
+            break
+        fid = i16(data, pos + 1)[0]
+        pos += 3
+        if fid == 1 and ftype == 15:
+            if data[pos] != "\x0c":
+                raise _Unexpected()
+            size = i32(data, pos + 1)[0]
+            pos += 5
+            for _ in xrange(size):
+                row = cf = cq = cv = ts = val = None
+                while True:
+                    ftype = ord(data[pos])
+                    if ftype == 0:
+                        pos += 1
+                        break
+                    fid = i16(data, pos + 1)[0]
+                    pos += 3
+                    if fid == 1 and ftype == 12:
+                        while True:
+                            ftype = ord(data[pos])
+                            if ftype == 0:
+                                pos += 1
+                                break
+                            fid = i16(data, pos + 1)[0]
+                            pos += 3
+                            if ftype == 11:
+                                n = i32(data, pos)[0]
+                                pos += 4
+                                value = data[pos:pos+n]
+                                pos += n
+                                if fid == 1:
+                                    row = value
+                                elif fid == 2:
+                                    cf = value
+                                elif fid == 3:
+                                    cq = value
+                                elif fid == 4:
+                                    cv = value
+                                else:
+                                    raise _Unexpected()
+                            elif fid == 5 and ftype == 10:
+                                ts = _I64.unpack_from(data, pos)[0]
+                                pos += 8
+                            else:
+                                raise _Unexpected()
+                    elif fid == 2 and ftype == 11:
+                        n = i32(data, pos)[0]
+                        pos += 4
+                        val = data[pos:pos+n]
+                        pos += n
+                    else:
+                        raise _Unexpected()
+                if columnar:
+                    add_row(row)
+                    add_cf(cf)
+                    add_cq(cq)
+                    add_cv(cv)
+                    add_ts(ts)
+                    add_val(val)
+                else:
+                    append(_new_cell(Cell, (row, cf, cq, cv, ts, val)))
+        elif fid == 2 and ftype == 2:
+            more = data[pos] != "\x00"
+            pos += 1
+        else:
+            raise _Unexpected()
+
+    if data[pos] != "\x00":
+        raise _Unexpected()
+    if columnar:
+        return _column_batch(rows, cfs, cqs, cvs, timestamps, values), more
+    return cells, more
+
+_SMALL = [chr(i) for i in xrange(256)]
+
+def _varint_bytes(n):
+    if n < 0x80:
+        return _SMALL[n]
+    out = []
+    while n >= 0x80:
+        out.append(_SMALL[(n & 0x7f) | 0x80])
+        n >>= 7
+    out.append(_SMALL[n])
+    return "".join(out)
+
+def _iter_columns(updates):
+    """ Yields (cf, cq, cv, ts, val, delete) for a list of ColumnUpdates and CompactMutations """
+    for u in updates:
+        if isinstance(u, CompactMutation):
+            for column in zip(u.cfs, u.cqs, u.cvs, u.tss, u.vals, u.deletes):
+                yield column
+        else:
+            yield u.colFamily, u.colQualifier, u.colVisibility, u.timestamp, u.value, u.deleteCell
+
+def _encode_compact_update_args(writer, cells):
+    """ Encodes update_args(writer, cells) with TCompactProtocol, the updates may include CompactMutations """
+    out = []
+    append = out.append
+    append("\x18")
+    append(_varint_bytes(len(writer)))
+    append(writer)
+    append("\x1b")
+    if cells:
+        append(_varint_bytes(len(cells)))
+        append("\x89")
+    else:
+        append("\x00")
+    for row, updates in cells.iteritems():
+        append(_varint_bytes(len(row)))
+        append(row)
+        columns = list(_iter_columns(updates))
+        n = len(columns)
+        if n < 15:
+            append(_SMALL[n << 4 | 12])
+        else:
+            append("\xfc")
+            append(_varint_bytes(n))
+        for cf, cq, cv, ts, val, delete in columns:
+            last = 0
+            for fid, value in ((1, cf), (2, cq), (3, cv)):
+                if value is not None:
+                    append(_SMALL[(fid - last) << 4 | 8])
+                    append(_varint_bytes(len(value)))
+                    append(value)
+                    last = fid
+            if ts is not None:
+                append(_SMALL[(4 - last) << 4 | 6])
+                append(_varint_bytes((ts << 1) ^ (ts >> 63)))
+                last = 4
+            if val is not None:
+                append(_SMALL[(5 - last) << 4 | 8])
+                append(_varint_bytes(len(val)))
+                append(val)
+                last = 5
+            if delete is not None:
+                append(_SMALL[(6 - last) << 4 | (1 if delete else 2)])
+            append("\x00")
+    append("\x00")
+    return "".join(out)
+
+_STRING_FIELD = struct.Struct("!bhi")
+_I64_FIELD = struct.Struct("!bhq")
+
+def _encode_binary_update_args(writer, cells):
+    """ Encodes update_args(writer, cells) with TBinaryProtocol, the updates may include CompactMutations """
+    string_field = _STRING_FIELD.pack
+    out = []
+    append = out.append
+    append(string_field(11, 1, len(writer)))
+    append(writer)
+    append(struct.pack("!bhbbi", 13, 2, 11, 15, len(cells)))
+    for row, updates in cells.iteritems():
+        append(_I32.pack(len(row)))
+        append(row)
+        columns = list(_iter_columns(updates))
+        append(struct.pack("!bi", 12, len(columns)))
+        for cf, cq, cv, ts, val, delete in columns:
+            if cf is not None:
+                append(string_field(11, 1, len(cf)))
+                append(cf)
+            if cq is not None:
+                append(string_field(11, 2, len(cq)))
+                append(cq)
+            if cv is not None:
+                append(string_field(11, 3, len(cv)))
+                append(cv)
+            if ts is not None:
+                append(_I64_FIELD.pack(10, 4, ts))
+            if val is not None:
+                append(string_field(11, 5, len(val)))
+                append(val)
+            if delete is not None:
+                append(struct.pack("!bhb", 2, 6, 1 if delete else 0))
+            append("\x00")
+    append("\x00")
+    return "".join(out)
+
+_UPDATE_ENCODERS = {
+    TCompactProtocol.TCompactProtocol: _encode_compact_update_args,
+    TBinaryProtocol.TBinaryProtocol: _encode_binary_update_args,
+    TBinaryProtocol.TBinaryProtocolAccelerated: _encode_binary_update_args,
+}
+
+_NEXTK_DECODERS = {
+    TCompactProtocol.TCompactProtocol: _decode_compact_nextK_result,
+    TBinaryProtocol.TBinaryProtocol: _decode_binary_nextK_result,
+    TBinaryProtocol.TBinaryProtocolAccelerated: _decode_binary_nextK_result,
+}
+
+def _to_cells(results):
+    return [Cell(e.key.row, e.key.colFamily, e.key.colQualifier, e.key.colVisibility, e.key.timestamp, e.value) for e in results]
+
+class ProxyClient(AccumuloProxy.Client):
+    """
+    AccumuloProxy.Client with fixes for generated calls that cannot be used as is, and an update call that
+    also accepts CompactMutations in place of ColumnUpdates.
+    """
+    def send_update(self, writer, cells):
+        protocol_class = self._oprot.__class__
+        if protocol_class is TBinaryProtocol.TBinaryProtocolAccelerated and fastbinary is not None and \
+                not any(_has_compact_mutations(updates) for updates in cells.itervalues()):
+            # the C codec is faster than the python encoder for plain ColumnUpdates
+            return AccumuloProxy.Client.send_update(self, writer, cells)
+        encode = _UPDATE_ENCODERS.get(protocol_class)
+        if encode is None:
+            # the generated code (and the C codec behind TBinaryProtocolAccelerated) only knows ColumnUpdates
+            cells = dict((row, _column_updates(updates)) for row, updates in cells.iteritems())
+            return AccumuloProxy.Client.send_update(self, writer, cells)
+        self._oprot.writeMessageBegin('update', TMessageType.CALL, self._seqid)
+        self._oprot.trans.write(encode(writer, cells))
+        self._oprot.writeMessageEnd()
+        self._oprot.trans.flush()
+
+    def updateAndFlush(self, login, tableName, cells):
+        cells = dict((row, _column_updates(updates)) for row, updates in cells.iteritems())
+        return AccumuloProxy.Client.updateAndFlush(self, login, tableName, cells)
+
+    def recv_splitRangeByTablets(self):
+        # the generated code collects the Ranges in a set, but the generated Range is not hashable
+        iprot = self._iprot
+        (fname, mtype, rseqid) = iprot.readMessageBegin()
+        if mtype == TMessageType.EXCEPTION:
+            x = TApplicationException()
+            x.read(iprot)
+            iprot.readMessageEnd()
+            raise x
+
+        ranges = None
+        error = None
+        iprot.readStructBegin()
+        while True:
+            (_, ftype, fid) = iprot.readFieldBegin()
+            if ftype == TType.STOP:
+                break
+            if fid == 0 and ftype == TType.SET:
+                ranges = []
+                (_, size) = iprot.readSetBegin()
+                for _ in xrange(size):
+                    rng = proxy.ttypes.Range()
+                    rng.read(iprot)
+                    ranges.append(rng)
+                iprot.readSetEnd()
+            elif fid in (1, 2, 3) and ftype == TType.STRUCT:
+                error = AccumuloProxy.splitRangeByTablets_result.thrift_spec[fid][3][0]()
+                error.read(iprot)
+            else:
+                iprot.skip(ftype)
+            iprot.readFieldEnd()
+        iprot.readStructEnd()
+        iprot.readMessageEnd()
+
+        if ranges is not None:
+            return ranges
+        if error is not None:
+            raise error
+        raise TApplicationException(TApplicationException.MISSING_RESULT, "splitRangeByTablets failed: unknown result")
+
+class CellClient(ProxyClient):
+    """
+    AccumuloProxy.Client with nextK_cells(), which parses the nextK reply frame straight into Cells instead of
+    building Key and KeyValue objects with the generated field by field read().
+    Accumulo uses it unless the protocol decodes with the fastbinary C extension, which is faster still.
+    """
+    def nextK_cells(self, scanner, k, columnar=False):
+        """ Returns (list of Cells, more) for the next k entries of the scanner, or (ColumnBatch, more) with columnar set """
+        self.send_nextK(scanner, k)
+        return self.recv_nextK_cells(columnar)
+
+    def recv_nextK_cells(self, columnar=False):
+        iprot = self._iprot
+        (fname, mtype, rseqid) = iprot.readMessageBegin()
+        if mtype == TMessageType.EXCEPTION:
+            x = TApplicationException()
+            x.read(iprot)
+            iprot.readMessageEnd()
+            raise x
+
+        decode = _NEXTK_DECODERS.get(iprot.__class__)
+        if decode is not None and isinstance(iprot.trans, (TTransport.TFramedTransport, TTransport.TMemoryBuffer)):
+            # the rest of the frame is the reply struct
+            data = iprot.trans.cstringio_buf.read()
+            iprot.readMessageEnd()
+            try:
+                return decode(data, columnar)
+            except (_Unexpected, IndexError, struct.error):
+                iprot = iprot.__class__(TTransport.TMemoryBuffer(data))
+
+        result = AccumuloProxy.nextK_result()
+        result.read(iprot)
+        if result.ouch1 is not None:
+            raise result.ouch1
+        if result.ouch2 is not None:
+            raise result.ouch2
+        if result.ouch3 is not None:
+            raise result.ouch3
+        if result.success is None:
+            raise TApplicationException(TApplicationException.MISSING_RESULT, "nextK failed: unknown result")
+        cells = _to_cells(result.success.results)
+        return _to_column_batch(cells) if columnar else cells, result.success.more
+
+def _nextK(client, scanner, k, columnar=False):
+    if isinstance(client, CellClient):
+        return client.nextK_cells(scanner, k, columnar)
+    results = client.nextK(scanner, k)
+    cells = _to_cells(results.results)
+    return _to_column_batch(cells) if columnar else cells, results.more
+
+def _next_batch(client, scanner, batchsize, columnar=False):
+    """ Returns (list of Cells, more), or (ColumnBatch, more) with columnar set, for the next batch of the scanner """
+    if isinstance(batchsize, AdaptiveBatchSize):
+        return batchsize.next_batch(client, scanner, columnar)
+    return _nextK(client, scanner, batchsize, columnar)
+
+class _ScanPrefetcher(threading.Thread):
+    """
+    Background thread that keeps up to `depth` nextK batches queued ahead of the consumer of a scan.
+    The thread uses the connection's client until the scan is exhausted or stop() is called.
+    """
+    def __init__(self, client, scanner, batchsize, depth, columnar=False):
+        super(_ScanPrefetcher, self).__init__()
+        self.daemon = True
+        self._client = client
+        self._scanner = scanner
+        self._batchsize = batchsize
+        self._columnar = columnar
+        self._queue = Queue(maxsize=depth)
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                batch = _next_batch(self._client, self._scanner, self._batchsize, self._columnar)
+                self._put((batch, None))
+                if not batch[1]:
+                    return
+        except Exception:
+            self._put((None, sys.exc_info()))
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def next_batch(self):
+        batch, exc_info = self._queue.get()
+        if exc_info is not None:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return batch
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+def _column_values(values):
+    """
+    Converts a sequence, numpy array or pandas Series to a list of strings, with None for missing values
+    (None and NaN).
+    """
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+    return [v if v is None or v.__class__ is str else (None if v != v else str(v)) for v in values]
+
+def _per_row(value, n, convert):
+    if value is None or isinstance(value, (basestring, int, long)):
+        return repeat(value, n)
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    return [convert(v) for v in value]
+
+class TokenBucket(object):
+    """
+    Token bucket limiting a BatchWriter to `rate` bytes or mutations per second on average, with bursts of up
+    to `capacity` (one second's worth by default).  A request larger than what is left is let through and
+    the bucket goes into debt, so the caller sleeps until the debt is paid back.
+    """
+    def __init__(self, rate, capacity=None, clock=time.time, sleep=time.sleep):
+        super(TokenBucket, self).__init__()
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._last = clock()
+
+    def acquire(self, n):
+        """ Takes n tokens, sleeping as long as needed, and returns the number of seconds slept """
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate) - n
+        self._last = now
+        if self._tokens >= 0:
+            return 0
+        wait = -self._tokens / self.rate
+        self._sleep(wait)
+        return wait
+
+class LatencyBackpressure(object):
+    """
+    Slows a BatchWriter down while its update and flush calls take longer than `target_latency_ms`.
+    Each slow call doubles the delay before the next send, starting at `min_delay_ms` and capped at
+    `max_delay_ms`, and each call within the target halves it until it drops back to zero.
+    """
+    def __init__(self, target_latency_ms, min_delay_ms=10, max_delay_ms=5000, sleep=time.sleep):
+        super(LatencyBackpressure, self).__init__()
+        self.target_latency_ms = target_latency_ms
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.delay_ms = 0
+        self._sleep = sleep
+
+    def record(self, latency_ms):
+        if latency_ms > self.target_latency_ms:
+            self.delay_ms = min(self.max_delay_ms, max(self.min_delay_ms, self.delay_ms * 2))
+        elif self.delay_ms:
+            self.delay_ms = self.delay_ms / 2 if self.delay_ms / 2 >= self.min_delay_ms else 0
+
+    def wait(self):
+        if self.delay_ms:
+            self._sleep(self.delay_ms / 1000.0)
+
+    def timed(self, fn, *args):
+        """ Waits out the current delay, then calls fn(*args) and records how long it took """
+        self.wait()
+        start = time.time()
+        try:
+            return fn(*args)
+        finally:
+            self.record((time.time() - start) * 1000)
+
+_TRANSIENT_ERRORS = (TTransportException, socket.error)
+
+class RetryPolicy(object):
+    """
+    Exponential backoff for calls that failed with a transport error.  Before retry n the caller waits
+    initial_delay * multiplier**(n-1) seconds, capped at max_delay, plus up to `jitter` times that at random,
+    then reconnects.  After max_attempts failed attempts in a row the last error is raised.
+    """
+    def __init__(self, max_attempts=5, initial_delay=0.1, max_delay=30, multiplier=2, jitter=0.5, sleep=time.sleep):
+        super(RetryPolicy, self).__init__()
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self._sleep = sleep
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+        return delay + delay * self.jitter * random.random()
+
+    def backoff(self, attempt, reconnect):
+        """
+        Called from an except block after `attempt` failed attempts: re-raises the error if no attempts are left,
+        otherwise waits and calls reconnect(), until it succeeds, and returns the new attempt count.
+        """
+        exc_info = sys.exc_info()
+        while True:
+            attempt += 1
+            if attempt >= self.max_attempts:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            self._sleep(self.delay(attempt))
+            try:
+                reconnect()
+                return attempt
+            except _TRANSIENT_ERRORS:
+                exc_info = sys.exc_info()
+
+    def call(self, fn, reconnect):
+        """ Returns fn(), retrying it after reconnect() when it raises a transport error """
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except _TRANSIENT_ERRORS:
+                attempt = self.backoff(attempt, reconnect)
+
+def _retried(method):
+    """ Retries an idempotent Accumulo method according to the connection's RetryPolicy, if it has one """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.retry is None:
+            return method(self, *args, **kwargs)
+        return self.retry.call(lambda: method(self, *args, **kwargs), self.reconnect)
+    return wrapper
+
+_SPOOL_RECORD = struct.Struct("!iI")
+
+class WriteAheadSpool(object):
+    """
+    Append only file recording the batches a BatchWriter sends, so batches that were buffered or sent but not
+    yet flushed when the proxy or the client went down can be sent again by a new writer.
+
+    Each batch is appended as a length and crc32 prefixed update_args struct in the binary protocol before it
+    is sent.  A successful flush or close marks every batch so far as done, which empties the file.
+    A record torn by a crash while it was being written is ignored.
+
+    :param sync: fsync after every batch instead of leaving the write in the OS page cache
+    """
+    def __init__(self, path, sync=False):
+        super(WriteAheadSpool, self).__init__()
+        self.path = path
+        self.sync = sync
+        self._file = open(path, "ab")
+
+    def append(self, cells):
+        data = _encode_binary_update_args("", cells)
+        self._file.write(_SPOOL_RECORD.pack(len(data), zlib.crc32(data) & 0xffffffff))
+        self._file.write(data)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def mark_done(self):
+        """ Marks every batch appended so far as done """
+        self._file.truncate(0)
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def pending(self):
+        """ Returns the {row: [ColumnUpdate]} batches not marked done, oldest first """
+        batches = []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + _SPOOL_RECORD.size <= len(data):
+            length, crc = _SPOOL_RECORD.unpack_from(data, pos)
+            payload = data[pos + _SPOOL_RECORD.size:pos + _SPOOL_RECORD.size + length]
+            if len(payload) < length or zlib.crc32(payload) & 0xffffffff != crc:
+                break
+            args = AccumuloProxy.update_args()
+            args.read(TBinaryProtocol.TBinaryProtocol(TTransport.TMemoryBuffer(payload)))
+            batches.append(args.cells)
+            pos += _SPOOL_RECORD.size + length
+        return batches
+
+    def close(self):
+        self._file.close()
+
+def _mutation_size(mut):
+    """ Approximate number of bytes a Mutation takes on the wire """
+    size = len(mut.row)
+    if isinstance(mut, CompactMutation):
+        return size + sum(len(s or '') for column in (mut.cfs, mut.cqs, mut.cvs, mut.vals) for s in column) + 8 * len(mut)
+    for u in mut.updates:
+        size += len(u.colFamily or '') + len(u.colQualifier or '') + len(u.colVisibility or '') + len(u.value or '') + 8
+    return size
+
 class BatchWriter(object):
-    """docstring for BatchWriter"""
-    def __init__(self, conn, table, max_memory=10*1024, latency_ms=30*1000, timeout_ms=5*1000, threads=10):
+    """
+    Writes mutations through a proxy side writer.
+
+    By default every add_mutation/add_mutations call is one update call to the proxy.  With buffer_size or
+    buffer_mutations set, mutations are collected on the client and sent in a single update call once the
+    buffer holds that many bytes or mutations, or when flush() or close() is called.  Buffered mutations for
+    the same row are merged into one, and with coalesce=True updates superseded by a later update of the same
+    column in the buffer are dropped before sending (see _coalesce_updates).
+
+    max_bytes_per_sec and max_mutations_per_sec cap the write rate with a TokenBucket each, and
+    target_latency_ms enables LatencyBackpressure, which delays sends while update and flush calls are slow.
+
+    spool, a path or WriteAheadSpool, records every batch before it is sent until it has been flushed;
+    replay() sends the batches a previous writer left unflushed in the spool.  A writer whose spool holds such
+    batches refuses to write or flush until replay() has been called, since that would discard them.
+
+    When the connection has a RetryPolicy, batches sent since the last flush are also kept in memory, and
+    after a transport error the writer reconnects, creates a new proxy writer and sends them again.  When the
+    proxy reports UnknownWriter, because it restarted and the connection was already reconnected by another
+    call, the writer does the same without reconnecting.  Once the batches kept in memory or in the spool
+    since the last flush hold max_unflushed_bytes, by default 4 * max_memory or 4 * buffer_size if that is
+    larger, the writer flushes itself.
+
+    The connection's TraceHooks, if any, are called after each update sent, flush and close.
+    """
+    def __init__(self, conn, table, max_memory=10*1024, latency_ms=30*1000, timeout_ms=5*1000, threads=10, buffer_size=0, buffer_mutations=0, coalesce=False,
+                 max_bytes_per_sec=None, max_mutations_per_sec=None, target_latency_ms=None, spool=None, max_unflushed_bytes=None):
         super(BatchWriter, self).__init__()
         self._conn = conn
-        self._writer = conn.client.createWriter(self._conn.login, table, WriterOptions(maxMemory=max_memory, latencyMs=latency_ms, timeoutMs=timeout_ms, threads=threads))
+        self._table = table
+        self._options = WriterOptions(maxMemory=max_memory, latencyMs=latency_ms, timeoutMs=timeout_ms, threads=threads)
+        self._writer = self._create_writer()
+        self.hooks = conn.hooks
+        self._resend = conn.retry is not None
+        self._unflushed = []
+        self._unflushed_bytes = 0
+        self.max_unflushed_bytes = 4 * max(max_memory, buffer_size) if max_unflushed_bytes is None else max_unflushed_bytes
         self._is_closed = False
+        self.buffer_size = buffer_size
+        self.buffer_mutations = buffer_mutations
+        self.coalesce = coalesce
+        self.byte_limiter = TokenBucket(max_bytes_per_sec) if max_bytes_per_sec else None
+        self.mutation_limiter = TokenBucket(max_mutations_per_sec) if max_mutations_per_sec else None
+        self.backpressure = LatencyBackpressure(target_latency_ms) if target_latency_ms else None
+        self.spool = WriteAheadSpool(spool) if isinstance(spool, basestring) else spool
+        self._replay_needed = self.spool is not None and len(self.spool.pending()) > 0
+        self._buffer = {}
+        self._buffered_bytes = 0
+        self._buffered_mutations = 0
+
+    @property
+    def table(self):
+        return self._table
+
+    def _create_writer(self):
+        return self._conn._create_writer(self._table, self._options)
+
+    def _buffering(self):
+        return self.buffer_size or self.buffer_mutations
+
+    def _add_to_buffer(self, mut):
+        _add_updates(self._buffer, mut)
+        self._buffered_bytes += _mutation_size(mut)
+        self._buffered_mutations += 1
+
+    def _buffer_full(self):
+        return (self.buffer_size and self._buffered_bytes >= self.buffer_size) or \
+               (self.buffer_mutations and self._buffered_mutations >= self.buffer_mutations)
+
+    def _send_buffer(self):
+        if self._buffer:
+            cells = self._buffer
+            nbytes, nmuts = self._buffered_bytes, self._buffered_mutations
+            self._buffer = {}
+            self._buffered_bytes = 0
+            self._buffered_mutations = 0
+            if self.coalesce:
+                cells = dict((row, _coalesce_updates(updates)) for row, updates in cells.iteritems())
+            self._send(cells, nbytes, nmuts)
+
+    def _send(self, cells, nbytes, nmuts):
+        if self.spool is not None:
+            self.spool.append(cells)
+        if self.byte_limiter is not None:
+            self.byte_limiter.acquire(nbytes)
+        if self.mutation_limiter is not None:
+            self.mutation_limiter.acquire(nmuts)
+        start = time.time()
+        if self.backpressure is not None:
+            self.backpressure.timed(self._recovering, self._update, cells)
+        else:
+            self._recovering(self._update, cells)
+        if self._resend:
+            self._unflushed.append(cells)
+        if self.hooks is not None:
+            self.hooks.writer_updated(self, cells, nmuts, nbytes, (time.time() - start) * 1000)
+        if self._retains_unflushed():
+            self._unflushed_bytes += nbytes
+            if self._unflushed_bytes >= self.max_unflushed_bytes:
+                self.flush()
+
+    def _retains_unflushed(self):
+        """ Whether batches are kept, for resending or in the spool, until they are flushed """
+        return self._resend or self.spool is not None
+
+    def _recovering(self, fn, *args):
+        """
+        Calls fn(*args), recovering the proxy writer and calling it again if the connection has a RetryPolicy,
+        after transport errors or when the proxy no longer knows the writer, e.g. because it restarted and
+        another call on the connection already reconnected to it.
+        """
+        recreated = False
+        while True:
+            try:
+                return fn(*args)
+            except _TRANSIENT_ERRORS:
+                if not self._resend:
+                    raise
+                self._recover()
+            except UnknownWriter:
+                if not self._resend or recreated:
+                    raise
+                recreated = True
+                self._recover(reconnect=False)
+
+    def _recover(self, reconnect=True):
+        """ Creates a new proxy writer and resends the unflushed batches, reconnecting first if reconnect is set """
+        attempt = 0
+        while True:
+            if reconnect:
+                attempt = self._conn.retry.backoff(attempt, self._conn.reconnect)
+            reconnect = True
+            try:
+                self._conn._writer_closed(self._writer)
+                self._writer = self._create_writer()
+                for cells in self._unflushed:
+                    self._update(cells)
+                return
+            except _TRANSIENT_ERRORS:
+                pass
+
+    def _update(self, cells):
+        self._conn.client.update(self._writer, cells)
+
+    def _check_replayed(self):
+        if self._replay_needed:
+            raise Exception("Spool %s holds batches from an earlier writer, call replay() first"%self.spool.path)
 
     ''' muts - a list of Mutation objects '''
     def add_mutations(self, muts):
         if self._is_closed:
             raise Exception("Cannot write to a closed writer")
+        self._check_replayed()
+
+        if self._buffering():
+            for mut in muts:
+                self._add_to_buffer(mut)
+                if self._buffer_full():
+                    self._send_buffer()
+            return
 
         cells = {}
+        nbytes = nmuts = 0
+        count_bytes = self.byte_limiter is not None or self.hooks is not None or self._retains_unflushed()
         for mut in muts:
-            cells.setdefault(mut.row, []).extend(mut.updates)
-        self._conn.client.update(self._writer, cells)
+            _add_updates(cells, mut)
+            if count_bytes:
+                nbytes += _mutation_size(mut)
+            nmuts += 1
+        self._send(cells, nbytes, nmuts)
 
     ''' mut - a Muation object '''
     def add_mutation(self, mut):
         if self._is_closed:
             raise Exception("Cannot write to a closed writer")
-        self._conn.client.update(self._writer, {mut.row: mut.updates})
+        self._check_replayed()
+
+        if self._buffering():
+            self._add_to_buffer(mut)
+            if self._buffer_full():
+                self._send_buffer()
+            return
+
+        cells = {}
+        _add_updates(cells, mut)
+        count_bytes = self.byte_limiter is not None or self.hooks is not None or self._retains_unflushed()
+        self._send(cells, _mutation_size(mut) if count_bytes else 0, 1)
+
+    def write_columns(self, rows, columns, cvs=None, tss=None, chunk_rows=10000):
+        """
+        Writes tabular data as one CompactMutation per row, without a put() call per value.
+        :param rows: sequence (list, numpy array, pandas Index...) of row ids
+        :param columns: list of (cf, cq, values) or dict of {(cf, cq): values}, with one value per row;
+                        values that are not strings are converted with str(), None and NaN are not written
+        :param cvs: column visibility of every cell, or a sequence with one per row
+        :param tss: timestamp of every cell, or a sequence with one per row
+        :param chunk_rows: number of rows handed to add_mutations at a time
+        """
+        if isinstance(columns, dict):
+            columns = [(cf, cq, values) for (cf, cq), values in columns.iteritems()]
+        families = [c[0] for c in columns]
+        qualifiers = [c[1] for c in columns]
+        rows = _column_values(rows)
+        n = len(rows)
+        columns_values = [_column_values(c[2]) for c in columns]
+        cvs = _per_row(cvs, n, lambda v: v)
+        tss = _per_row(tss, n, lambda v: v if v is None else int(v))
+        # izip stops at the shortest sequence, which would silently drop the remaining rows
+        for cf, cq, vals in izip(families, qualifiers, columns_values):
+            if len(vals) != n:
+                raise Exception("Column %s:%s has %d values for %d rows"%(cf, cq, len(vals), n))
+        for name, vals in (("cvs", cvs), ("tss", tss)):
+            if isinstance(vals, list) and len(vals) != n:
+                raise Exception("%s has %d values for %d rows"%(name, len(vals), n))
+        values = izip(*columns_values)
+
+        muts = []
+        for row, vals, cv, ts in izip(rows, values, cvs, tss):
+            m = CompactMutation(row)
+            if None in vals:
+                keep = [i for i, v in enumerate(vals) if v is not None]
+                m.cfs = [families[i] for i in keep]
+                m.cqs = [qualifiers[i] for i in keep]
+                m.vals = [vals[i] for i in keep]
+            else:
+                m.cfs = families[:]
+                m.cqs = qualifiers[:]
+                m.vals = list(vals)
+            k = len(m.vals)
+            m.cvs = [cv] * k
+            m.tss = [ts] * k
+            m.deletes = [None] * k
+            muts.append(m)
+            if len(muts) >= chunk_rows:
+                self.add_mutations(muts)
+                muts = []
+        if muts:
+            self.add_mutations(muts)
 
     def flush(self):
         if self._is_closed:
             raise Exception("Cannot flush a closed writer")
+        self._check_replayed()
+        self._send_buffer()
+        start = time.time()
+        if self.backpressure is not None:
+            self.backpressure.timed(self._recovering, self._flush)
+        else:
+            self._recovering(self._flush)
+        self._unflushed = []
+        self._unflushed_bytes = 0
+        if self.spool is not None:
+            self.spool.mark_done()
+        if self.hooks is not None:
+            self.hooks.writer_flushed(self, (time.time() - start) * 1000)
+
+    def replay(self):
+        """
+        Sends the batches left in the spool by a writer that was not flushed or closed, then flushes them.
+        Returns the number of batches sent.
+        """
+        if self._is_closed:
+            raise Exception("Cannot write to a closed writer")
+        batches = self.spool.pending()
+        for cells in batches:
+            self._update(cells)
+        if batches:
+            self._flush()
+            self.spool.mark_done()
+        self._replay_needed = False
+        return len(batches)
+
+    def _flush(self):
         self._conn.client.flush(self._writer)
 
     def close(self):
-        self._conn.client.closeWriter(self._writer)
+        self._send_buffer()
+        start = time.time()
+        self._recovering(self._close_writer)
+        self._unflushed = []
+        self._unflushed_bytes = 0
         self._is_closed = True
+        self._close_spool()
+        if self.hooks is not None:
+            self.hooks.writer_closed(self, (time.time() - start) * 1000)
+
+    def _close_spool(self):
+        if self.spool is not None:
+            # keep the batches of an earlier writer that were never replayed
+            if not self._replay_needed:
+                self.spool.mark_done()
+            self.spool.close()
+
+    def _close_writer(self):
+        self._conn.client.closeWriter(self._writer)
+        self._conn._writer_closed(self._writer)
+
+class AsyncBatchWriter(BatchWriter):
+    """
+    BatchWriter whose update, flush and closeWriter calls are made by a background sender thread, so the
+    caller only blocks when `queue_size` batches are already waiting to be sent.
+
+    An error raised by the sender is re-raised by the next add_mutation, add_mutations, flush or close call.
+    flush() and close() return once everything queued before them has been sent and flushed.
+    Unlike BatchWriter it does not resend batches after transport errors when the connection has a RetryPolicy.
+
+    :param sender_conn: connection the proxy writer is created on and used by the sender thread.  If None a
+                        dedicated connection to conn's proxy is opened and closed by close().  Passing conn
+                        itself is allowed, but conn must then not be used by other threads while the writer is open.
+    """
+    def __init__(self, conn, table, queue_size=4, sender_conn=None, **kwargs):
+        self._owns_sender_conn = sender_conn is None
+        self._sender_conn = conn._clone() if sender_conn is None else sender_conn
+        try:
+            super(AsyncBatchWriter, self).__init__(conn, table, **kwargs)
+        except Exception:
+            self._close_sender_conn()
+            raise
+        # the sender thread owns the proxy writer, errors it hits are re-raised as they are
+        self._resend = False
+        self._queue = Queue(maxsize=queue_size)
+        self._error = None
+        self._sender = threading.Thread(target=self._send_loop)
+        self._sender.daemon = True
+        self._sender.start()
+
+    def _create_writer(self):
+        # writer ids are only known to the proxy they were created on
+        return self._sender_conn._create_writer(self._table, self._options)
+
+    def _send_loop(self):
+        client = self._sender_conn.client
+        while True:
+            op, cells = self._queue.get()
+            try:
+                if op == "update" and self._error is None:
+                    client.update(self._writer, cells)
+                elif op == "flush" and self._error is None:
+                    client.flush(self._writer)
+                elif op == "close":
+                    client.closeWriter(self._writer)
+            except Exception:
+                if self._error is None:
+                    self._error = sys.exc_info()
+            finally:
+                self._queue.task_done()
+            if op == "close":
+                return
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+
+    def add_mutations(self, muts):
+        self._check_error()
+        super(AsyncBatchWriter, self).add_mutations(muts)
+
+    def add_mutation(self, mut):
+        self._check_error()
+        super(AsyncBatchWriter, self).add_mutation(mut)
+
+    def _update(self, cells):
+        self._check_error()
+        self._queue.put(("update", cells))
+
+    def _flush(self):
+        self._queue.put(("flush", None))
+        self._queue.join()
+        self._check_error()
+
+    def close(self):
+        try:
+            self._send_buffer()
+        finally:
+            self._is_closed = True
+            start = time.time()
+            try:
+                self._close_writer()
+            finally:
+                self._close_sender_conn()
+        self._close_spool()
+        if self.hooks is not None:
+            self.hooks.writer_closed(self, (time.time() - start) * 1000)
+
+    def _close_writer(self):
+        if self._sender.is_alive():
+            self._queue.put(("close", None))
+            self._sender.join()
+            if self._error is None:
+                self._sender_conn._writer_closed(self._writer)
+        self._check_error()
+
+    def _close_sender_conn(self):
+        if self._owns_sender_conn:
+            self._owns_sender_conn = False
+            self._sender_conn.close()
+
+class MultiTableBatchWriter(object):
+    """
+    Writes mutations to several tables through one proxy side writer per table, created when a table is
+    first written to, with a single client side buffer shared by all tables.
+
+    Once the buffer holds buffer_size bytes or buffer_mutations mutations in total, the pending updates of
+    every table are sent in one cycle of back to back update calls.  flush() and close() send the buffer,
+    then flush or close all the proxy writers in one pipelined round trip.  max_memory, latency_ms,
+    timeout_ms and threads are the WriterOptions of each proxy writer.
+    """
+    def __init__(self, conn, max_memory=10*1024, latency_ms=30*1000, timeout_ms=5*1000, threads=10, buffer_size=1024*1024, buffer_mutations=0, coalesce=False):
+        super(MultiTableBatchWriter, self).__init__()
+        self._conn = conn
+        self._options = WriterOptions(maxMemory=max_memory, latencyMs=latency_ms, timeoutMs=timeout_ms, threads=threads)
+        self.buffer_size = buffer_size
+        self.buffer_mutations = buffer_mutations
+        self.coalesce = coalesce
+        self._writers = {}
+        self._buffers = {}
+        self._buffered_bytes = 0
+        self._buffered_mutations = 0
+        self._is_closed = False
+
+    def _get_writer(self, table):
+        writer = self._writers.get(table)
+        if writer is None:
+            writer = self._writers[table] = self._conn._create_writer(table, self._options)
+        return writer
+
+    def _buffer_full(self):
+        return (self.buffer_size and self._buffered_bytes >= self.buffer_size) or \
+               (self.buffer_mutations and self._buffered_mutations >= self.buffer_mutations) or \
+               (not self.buffer_size and not self.buffer_mutations)
+
+    def _send_buffers(self):
+        buffers = self._buffers
+        self._buffers = {}
+        self._buffered_bytes = 0
+        self._buffered_mutations = 0
+        for table, cells in buffers.iteritems():
+            if not cells:
+                continue
+            if self.coalesce:
+                cells = dict((row, _coalesce_updates(updates)) for row, updates in cells.iteritems())
+            self._conn.client.update(self._writers[table], cells)
+
+    ''' muts - a list of Mutation objects '''
+    def add_mutations(self, table, muts):
+        if self._is_closed:
+            raise Exception("Cannot write to a closed writer")
+        self._get_writer(table)
+        cells = self._buffers.setdefault(table, {})
+        for mut in muts:
+            _add_updates(cells, mut)
+            self._buffered_bytes += _mutation_size(mut)
+            self._buffered_mutations += 1
+            if self._buffer_full():
+                self._send_buffers()
+                cells = self._buffers.setdefault(table, {})
+
+    ''' mut - a Mutation object '''
+    def add_mutation(self, table, mut):
+        self.add_mutations(table, [mut])
+
+    def _call_writers(self, name):
+        pipeline = self._conn.pipeline()
+        for writer in self._writers.itervalues():
+            getattr(pipeline, name)(writer)
+        pipeline.execute()
+
+    def flush(self):
+        if self._is_closed:
+            raise Exception("Cannot flush a closed writer")
+        self._send_buffers()
+        self._call_writers("flush")
+
+    def close(self):
+        try:
+            self._send_buffers()
+        finally:
+            self._is_closed = True
+            self._call_writers("closeWriter")
+            for writer in self._writers.itervalues():
+                self._conn._writer_closed(writer)
+
+class ScanCheckpoint(namedtuple("ScanCheckpoint", "table options last_key")):
+    """
+    Where a scan got to: its table, the ScanOptions it was created with and the Key of the last cell it returned
+    (None if it has not returned any).  scan(resume_from=checkpoint) continues right after that key.
+    to_token() and from_token() convert it to and from a string for storing it or passing it to another process.
+    """
+    __slots__ = ()
+
+    def to_token(self):
+        parts = [self.table, TSerialization.serialize(self.options),
+                 TSerialization.serialize(self.last_key) if self.last_key is not None else ""]
+        return base64.urlsafe_b64encode("\x01" + "".join(_I32.pack(len(p)) + p for p in parts))
+
+    @classmethod
+    def from_token(cls, token):
+        data = base64.urlsafe_b64decode(str(token))
+        if data[:1] != "\x01":
+            raise Exception("Unknown scan checkpoint version")
+        parts = []
+        pos = 1
+        for _ in range(3):
+            length = _I32.unpack_from(data, pos)[0]
+            parts.append(data[pos + 4:pos + 4 + length])
+            pos += 4 + length
+        options = TSerialization.deserialize(ScanOptions(), parts[1])
+        last_key = TSerialization.deserialize(Key(), parts[2]) if parts[2] else None
+        return cls(parts[0], options, last_key)
+
+class ScanIterator(object):
+    """
+    Iterator over the results of a scan.  Its proxy scanner is created when iteration starts and closed once the
+    scan is exhausted, or when it is closed, left as a context manager, or garbage collected before that.
+    """
+    def __init__(self, results):
+        super(ScanIterator, self).__init__()
+        self._results = results
+
+    def __iter__(self):
+        return self._results
+
+    def next(self):
+        return self._results.next()
+
+    def close(self):
+        self._results.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _cells(batches):
+    try:
+        for cells in batches:
+            for cell in cells:
+                yield cell
+    finally:
+        batches.close()
+
+def _column_batches(batches):
+    try:
+        for batch in batches:
+            if len(batch.rows):
+                yield batch
+    finally:
+        batches.close()
+
+class _ScanProgress(object):
+    __slots__ = ("last_key", "last")
+
+    def __init__(self, last_key):
+        self.last_key = last_key
+        self.last = None
+
+    def key(self):
+        c = self.last
+        if c is None:
+            return self.last_key
+        return Key(row=c.row, colFamily=c.cf, colQualifier=c.cq, colVisibility=c.cv, timestamp=c.ts)
+
+def _resumable_cells(conn, table, options, progress, batchsize, prefetch):
+    # kept apart from ResumableScan so the generator does not reference it, a cycle would stop a
+    # ResumableScan that is dropped part way from being collected and its scanner from being closed
+    attempt = 0
+    reopened = False
+    while True:
+        rng = options.range
+        last_key = progress.key()
+        if last_key is not None:
+            rng = _resume_range(rng, last_key)
+            if rng is None:
+                return
+        scan_options = ScanOptions(options.authorizations, rng, options.columns, options.iterators, options.bufferSize)
+        cells = _cells(conn._perform_batches(functools.partial(conn._open_scanner, "createScanner", table, scan_options), batchsize, prefetch))
+        try:
+            for cell in cells:
+                progress.last = cell
+                yield cell
+                attempt = 0
+                reopened = False
+            return
+        except _TRANSIENT_ERRORS:
+            if conn.retry is None:
+                raise
+            attempt = conn.retry.backoff(attempt, conn.reconnect)
+        except UnknownScanner:
+            # the proxy restarted, and another call already reconnected, or the scanner timed out on the proxy:
+            # open a new scanner after the last cell on the current connection, once per cell returned
+            if conn.retry is None or reopened:
+                raise
+            reopened = True
+        finally:
+            cells.close()
+
+class ResumableScan(ScanIterator):
+    """
+    Iterator over the Cells of a scan, returned by Accumulo.scan().  checkpoint() returns a ScanCheckpoint for the
+    last cell returned so far, from which the scan can be continued later.  When the connection has a RetryPolicy
+    a transport error reconnects and continues with a new scanner right after the last cell, as does an UnknownScanner
+    error without reconnecting.
+    """
+    def __init__(self, conn, table, options, last_key=None, batchsize=10, prefetch=0):
+        self._progress = _ScanProgress(last_key)
+        super(ResumableScan, self).__init__(_resumable_cells(conn, table, options, self._progress, batchsize, prefetch))
+        self.table = table
+        self.options = options
+        self.batchsize = batchsize
+        self.prefetch = prefetch
+
+    def checkpoint(self):
+        return ScanCheckpoint(self.table, self.options, self._progress.key())
+
+class Pipeline(object):
+    """
+    Queues proxy calls and sends them back to back on the connection's transport when execute() is called,
+    then reads the replies in order, so a burst of independent calls costs about one round trip.
+    Calls take the AccumuloProxy.Client names and arguments, e.g. pipeline.tableExists(conn.login, "t1").
+    At most `max_in_flight` replies are left unread at any time so neither side's socket buffer fills up.
+    """
+    def __init__(self, client, max_in_flight=128):
+        super(Pipeline, self).__init__()
+        self._client = client
+        self.max_in_flight = max_in_flight
+        self._calls = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        send = getattr(self._client, "send_" + name, None)
+        if send is None:
+            raise AttributeError(name)
+        # oneway calls such as update have no reply to read
+        recv = getattr(self._client, "recv_" + name, None)
+
+        def queue(*args):
+            self._calls.append((send, recv, args))
+            return self
+        return queue
+
+    def __len__(self):
+        return len(self._calls)
+
+    def execute(self, raise_on_error=True):
+        """
+        Sends all queued calls and returns their results in order (None for oneway calls).
+        Errors returned by the proxy do not interrupt the pipeline; once every reply has been read the first
+        one is raised, or with raise_on_error=False it is returned in place of that call's result.
+        """
+        calls, self._calls = self._calls, []
+        results = [None] * len(calls)
+        errors = []
+        pending = deque()
+
+        def receive():
+            i = pending.popleft()
+            try:
+                results[i] = calls[i][1]()
+            except TTransportException:
+                raise
+            except Exception, e:
+                results[i] = e
+                errors.append(e)
+
+        for i, (send, recv, args) in enumerate(calls):
+            send(*args)
+            if recv is not None:
+                pending.append(i)
+                if len(pending) >= self.max_in_flight:
+                    receive()
+        while pending:
+            receive()
+
+        if errors and raise_on_error:
+            raise errors[0]
+        return results
+
+def _get_protocol(protocol, transport):
+    if protocol == "compact":
+        return TCompactProtocol.TCompactProtocol(transport)
+    elif protocol == "binary":
+        return TBinaryProtocol.TBinaryProtocol(transport)
+    elif protocol == "accelerated":
+        # the generated ttypes only use the C codec with TBinaryProtocolAccelerated, the wire format is
+        # the same as TBinaryProtocol so fall back to that when the extension is not built
+        if fastbinary is None:
+            return TBinaryProtocol.TBinaryProtocol(transport)
+        return TBinaryProtocol.TBinaryProtocolAccelerated(transport)
+    else:
+        raise Exception("Unknown protocol: %s"%protocol)
 
 class Accumulo(object):
     """ Proxy Accumulo """
-    def __init__(self, host="localhost", port=50096, user='root', password='secret', _connect=True):
+    def __init__(self, host="localhost", port=50096, user='root', password='secret', _connect=True,
+                 protocol="compact", recv_buffer_size=None, send_buffer_size=None, retry=None, metrics=None, hooks=None):
+        """
+        :param protocol: "compact", "binary" or "accelerated" (binary with the C fastbinary codec, which decodes
+                         scan results much faster).  Must match the protocol the proxy is configured with.
+        :param recv_buffer_size: SO_RCVBUF for the proxy socket, the OS default if None
+        :param send_buffer_size: SO_SNDBUF for the proxy socket, the OS default if None
+        :param retry: a RetryPolicy for reconnecting after transport errors.  Idempotent calls are retried,
+                      scan() continues after the last cell it returned and BatchWriters resend unflushed batches.
+        :param metrics: an RpcMetrics recording the calls, latency and bytes of every proxy method called
+        :param hooks: a TraceHooks called as scans and BatchWriters create, fetch, write, flush and close
+        """
         super(Accumulo, self).__init__()
-        self.transport = TTransport.TFramedTransport(TSocket.TSocket(host, port))
-        self.protocol = TCompactProtocol.TCompactProtocol(self.transport)
-        self.client = AccumuloProxy.Client(self.protocol)
+        self._host = host
+        self._port = port
+        self._user = user
+        self._password = password
+        self._protocol_name = protocol
+        self._recv_buffer_size = recv_buffer_size
+        self._send_buffer_size = send_buffer_size
+        self.retry = retry
+        self.metrics = metrics
+        self.hooks = hooks
+        self._registry_lock = threading.Lock()
+        self._open_scanners = {}
+        self._open_writers = {}
+        self._create_client()
 
         if _connect:
-            self.transport.open()
-            self.login = self.client.login(user, {'password':password})
+            self._open()
+
+    def _create_client(self):
+        self.socket = TSocket.TSocket(self._host, self._port)
+        if self.metrics is None:
+            self.transport = TTransport.TFramedTransport(self.socket)
+        else:
+            self.transport = CountingFramedTransport(self.socket)
+        self.protocol = _get_protocol(self._protocol_name, self.transport)
+        if self.protocol.__class__ == TBinaryProtocol.TBinaryProtocolAccelerated:
+            client_class = ProxyClient
+        else:
+            client_class = CellClient
+        if self.metrics is not None:
+            client_class = instrumented_client_class(client_class)
+        self.client = client_class(self.protocol)
+        self.client.metrics = self.metrics
+
+    def _open(self):
+        self.transport.open()
+        if self._recv_buffer_size:
+            self.socket.handle.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._recv_buffer_size)
+        if self._send_buffer_size:
+            self.socket.handle.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self._send_buffer_size)
+        self.login = self.client.login(self._user, {'password':self._password})
+
+    def reconnect(self):
+        """ Replaces the connection to the proxy with a new one and logs in again, e.g. after a transport error """
+        try:
+            self.transport.close()
+        except Exception:
+            pass
+        self._create_client()
+        self._open()
 
     def close(self):
         self.transport.close()
 
+    def _clone(self):
+        """ Opens a new connection to the same proxy with the same credentials, protocol and options """
+        return Accumulo(host=self._host, port=self._port, user=self._user, password=self._password,
+                        protocol=self._protocol_name, recv_buffer_size=self._recv_buffer_size,
+                        send_buffer_size=self._send_buffer_size, retry=self.retry, metrics=self.metrics, hooks=self.hooks)
+
+    def open_scanners(self):
+        """ ScanInfos of the proxy scanners used through this connection that have not been closed yet """
+        with self._registry_lock:
+            return self._open_scanners.values()
+
+    def open_writers(self):
+        """ (table, writer id) of the proxy writers created through this connection that have not been closed yet """
+        with self._registry_lock:
+            return [(table, writer) for writer, table in self._open_writers.iteritems()]
+
+    def open_counts(self):
+        """ Returns {"scanners": number of open scanners, "writers": number of open writers}, e.g. to check for leaks """
+        with self._registry_lock:
+            return {"scanners": len(self._open_scanners), "writers": len(self._open_writers)}
+
+    def _create_writer(self, table, options):
+        writer = self.client.createWriter(self.login, table, options)
+        with self._registry_lock:
+            self._open_writers[writer] = table
+        return writer
+
+    def _writer_closed(self, writer):
+        with self._registry_lock:
+            self._open_writers.pop(writer, None)
+
+    def pipeline(self, max_in_flight=128):
+        """ Returns a Pipeline for sending many independent calls over this connection in one round trip """
+        return Pipeline(self.client, max_in_flight)
+
+    @_retried
     def list_tables(self):
         return [t for t in self.client.listTables(self.login)]
 
+    @_retried
     def table_exists(self, table):
         return self.client.tableExists(self.login, table)
 
@@ -207,7 +1925,9 @@ class Accumulo(object):
         writer.close()
 
     def _get_range(self, scanrange):
-        if scanrange:
+        if isinstance(scanrange, proxy.ttypes.Range):
+            return scanrange
+        elif scanrange:
             return scanrange.to_range()
         else:
             return None
@@ -230,29 +1950,170 @@ class Accumulo(object):
         else:
             raise Exception("Cannot process iterator: %s"%iter)
 
-    def scan(self, table, scanrange=None, cols=None, auths=None, iterators=None, bufsize=None, batchsize=10):
-        options = ScanOptions(auths, self._get_range(scanrange), _get_scan_columns(cols), self._get_iterator_settings(iterators), bufsize)
-        scanner = self.client.createScanner(self.login, table, options)
-        return self.perform_scan(scanner, batchsize)
+    def _scan_options(self, scanrange, cols, auths, iterators, bufsize):
+        return ScanOptions(auths, self._get_range(scanrange), _get_scan_columns(cols), self._get_iterator_settings(iterators), bufsize)
+
+    def _open_scanner(self, create, table, options):
+        """ Creates a scanner with the client method named create and returns its ScanInfo """
+        start = time.time()
+        scan = ScanInfo(table, options, getattr(self.client, create)(self.login, table, options))
+        if self.hooks is not None:
+            self.hooks.scanner_created(scan, (time.time() - start) * 1000)
+        return scan
 
-    def batch_scan(self, table, scanranges=None, cols=None, auths=None, iterators=None, numthreads=None, batchsize=10):
+    def _create_scanner(self, table, scanrange, cols, auths, iterators, bufsize):
+        """ Returns a function creating the scanner, for _perform_batches to call once the scan starts """
+        options = self._scan_options(scanrange, cols, auths, iterators, bufsize)
+        return functools.partial(self._open_scanner, "createScanner", table, options)
+
+    def _create_batch_scanner(self, table, scanranges, cols, auths, iterators, numthreads):
         options = BatchScanOptions(auths, self._get_ranges(scanranges), _get_scan_columns(cols), self._get_iterator_settings(iterators), numthreads)
-        scanner = self.client.createBatchScanner(self.login, table, options)
-        return self.perform_scan(scanner, batchsize)
+        return functools.partial(self._open_scanner, "createBatchScanner", table, options)
 
-    def perform_scan(self, scanner, batchsize):
-        while True:
-            results = self.client.nextK(scanner, batchsize)
-            for e in results.results:
-                yield Cell(e.key.row, e.key.colFamily, e.key.colQualifier, e.key.colVisibility, e.key.timestamp, e.value)
-        
-            if not results.more:
-                self.client.closeScanner(scanner)
-                raise StopIteration
+    def scan(self, table=None, scanrange=None, cols=None, auths=None, iterators=None, bufsize=None, batchsize=10, prefetch=0, resume_from=None):
+        """
+        Returns a ResumableScan over the Cells of table, see perform_scan() for batchsize and prefetch.
+        :param resume_from: a ScanCheckpoint or checkpoint token from ResumableScan.checkpoint(); the scan continues
+                            right after its last key, on its table and with its scan options instead of the ones given here
+        """
+        if resume_from is not None:
+            if isinstance(resume_from, basestring):
+                resume_from = ScanCheckpoint.from_token(resume_from)
+            if table is not None and table != resume_from.table:
+                raise Exception("Checkpoint is for table %s, not %s"%(resume_from.table, table))
+            return ResumableScan(self, resume_from.table, resume_from.options, resume_from.last_key, batchsize, prefetch)
+        options = self._scan_options(scanrange, cols, auths, iterators, bufsize)
+        return ResumableScan(self, table, options, None, batchsize, prefetch)
+
+    def batch_scan(self, table, scanranges=None, cols=None, auths=None, iterators=None, numthreads=None, batchsize=10, prefetch=0):
+        """ Returns a ScanIterator over the Cells of table in the given ranges, see perform_scan() for batchsize and prefetch """
+        open_scan = self._create_batch_scanner(table, scanranges, cols, auths, iterators, numthreads)
+        return ScanIterator(_cells(self._perform_batches(open_scan, batchsize, prefetch)))
+
+    def scan_rows(self, table, scanrange=None, cols=None, auths=None, iterators=None, bufsize=None, batchsize=10, prefetch=0,
+                  max_row_cells=None, truncate=False):
+        """ Same as scan(), but yields (row, [cells]) for each row, see group_rows() for max_row_cells and truncate """
+        cells = self.scan(table, scanrange, cols, auths, iterators, bufsize, batchsize, prefetch)
+        return group_rows(cells, max_row_cells, truncate)
+
+    def scan_columnar(self, table, scanrange=None, cols=None, auths=None, iterators=None, bufsize=None, batchsize=1000, prefetch=0):
+        """ Same as scan(), but yields a ColumnBatch of parallel columns per nextK batch instead of Cells """
+        open_scan = self._create_scanner(table, scanrange, cols, auths, iterators, bufsize)
+        return ScanIterator(_column_batches(self._perform_batches(open_scan, batchsize, prefetch, columnar=True)))
+
+    def batch_scan_columnar(self, table, scanranges=None, cols=None, auths=None, iterators=None, numthreads=None, batchsize=1000, prefetch=0):
+        """ Same as batch_scan(), but yields a ColumnBatch of parallel columns per nextK batch instead of Cells """
+        open_scan = self._create_batch_scanner(table, scanranges, cols, auths, iterators, numthreads)
+        return ScanIterator(_column_batches(self._perform_batches(open_scan, batchsize, prefetch, columnar=True)))
+
+    def perform_scan(self, scanner, batchsize, prefetch=0, scan=None):
+        """
+        :param scanner: the proxy scanner id returned by createScanner or createBatchScanner
+        :param batchsize: number of entries requested per nextK call, or an AdaptiveBatchSize
+        :param prefetch: number of batches to fetch ahead in a background thread (0 disables prefetching).
+                         While a prefetching scan is open its thread owns this connection's client, so
+                         use a separate Accumulo instance for any other calls made during the scan.
+        :param scan: the ScanInfo passed to the hooks, one with only the scanner id if None
+
+        Returns a generator over the Cells of the scanner, which closes it once it is exhausted, or when the
+        generator is closed or garbage collected before that.
+        """
+        scan = scan or ScanInfo(None, None, scanner)
+        return _cells(self._perform_batches(lambda: scan, batchsize, prefetch))
+
+    def perform_columnar_scan(self, scanner, batchsize, prefetch=0, scan=None):
+        """ Generator of a ColumnBatch per nextK batch of the scanner, see perform_scan() for the arguments """
+        scan = scan or ScanInfo(None, None, scanner)
+        return _column_batches(self._perform_batches(lambda: scan, batchsize, prefetch, columnar=True))
+
+    def _perform_batches(self, open_scan, batchsize, prefetch, columnar=False):
+        """
+        Calls open_scan() for the ScanInfo of the scanner once iteration starts, then yields the list of Cells
+        (a ColumnBatch with columnar set) returned by each nextK call.  The scanner is closed once it is exhausted, and also if the generator is
+        closed or garbage collected early or a call fails, in which case errors from closeScanner are ignored.
+        """
+        scan = open_scan()
+        scanner = scan.scanner
+        with self._registry_lock:
+            self._open_scanners[scanner] = scan
+        hooks = self.hooks
+        ncells = 0
+        prefetcher = None
+        exhausted = False
+        try:
+            if prefetch:
+                prefetcher = _ScanPrefetcher(self.client, scanner, batchsize, prefetch, columnar)
+                prefetcher.start()
+                next_batch = prefetcher.next_batch
+            else:
+                next_batch = lambda: _next_batch(self.client, scanner, batchsize, columnar)
+
+            while True:
+                start = time.time()
+                cells, more = next_batch()
+                if hooks is not None:
+                    ncells += _batch_len(cells)
+                    hooks.scan_batch(scan, cells, _batch_bytes(cells), (time.time() - start) * 1000)
+                yield cells
+
+                if not more:
+                    break
+            exhausted = True
+        finally:
+            if prefetcher is not None:
+                prefetcher.stop()
+            if not exhausted:
+                try:
+                    self._close_scanner(scan, ncells)
+                except Exception:
+                    pass
+
+        self._close_scanner(scan, ncells)
+
+    def _close_scanner(self, scan, ncells):
+        try:
+            self.client.closeScanner(scan.scanner)
+        finally:
+            with self._registry_lock:
+                self._open_scanners.pop(scan.scanner, None)
+        if self.hooks is not None:
+            self.hooks.scanner_closed(scan, ncells)
     
-    def create_batch_writer(self, table, max_memory=10*1024, latency_ms=30*1000, timeout_ms=5*1000, threads=10):
-        return BatchWriter(self, table, max_memory, latency_ms, timeout_ms, threads)
+    def create_batch_writer(self, table, max_memory=10*1024, latency_ms=30*1000, timeout_ms=5*1000, threads=10, buffer_size=0, buffer_mutations=0, coalesce=False,
+                            max_bytes_per_sec=None, max_mutations_per_sec=None, target_latency_ms=None, spool=None, max_unflushed_bytes=None):
+        return BatchWriter(self, table, max_memory, latency_ms, timeout_ms, threads, buffer_size, buffer_mutations, coalesce,
+                           max_bytes_per_sec, max_mutations_per_sec, target_latency_ms, spool, max_unflushed_bytes)
+
+    def create_multi_table_batch_writer(self, max_memory=10*1024, latency_ms=30*1000, timeout_ms=5*1000, threads=10, buffer_size=1024*1024, buffer_mutations=0, coalesce=False):
+        return MultiTableBatchWriter(self, max_memory, latency_ms, timeout_ms, threads, buffer_size, buffer_mutations, coalesce)
+
+    def create_async_batch_writer(self, table, queue_size=4, sender_conn=None, **kwargs):
+        """
+        Returns an AsyncBatchWriter, kwargs are the create_batch_writer arguments.  Unless sender_conn is given the
+        writer sends on a dedicated connection to the same proxy, which it closes when it is closed.
+        """
+        return AsyncBatchWriter(self, table, queue_size, sender_conn, **kwargs)
     
+    def write_frame(self, table, frame, cf='', row_column=None, cvs=None, tss=None, **writer_args):
+        """
+        Writes a pandas DataFrame (or anything with columns, index and frame[column]) through a BatchWriter.
+        Each cell is written to its frame row (the index, or the row_column column) with the column label as the
+        qualifier under family cf; a (cf, cq) tuple label, e.g. from a MultiIndex, sets both.
+        See BatchWriter.write_columns for cvs and tss, writer_args go to create_batch_writer.
+        """
+        columns = []
+        for label in frame.columns:
+            if label == row_column:
+                continue
+            family, qualifier = label if isinstance(label, tuple) else (cf, label)
+            columns.append((str(family), str(qualifier), frame[label]))
+        rows = frame.index if row_column is None else frame[row_column]
+
+        writer = self.create_batch_writer(table, **writer_args)
+        writer.write_columns(rows, columns, cvs, tss)
+        writer.close()
+
+    @_retried
     def delete_rows(self, table, srow, erow):
         self.client.deleteRows(self.login, table, srow, erow)
 
@@ -262,21 +2123,26 @@ class Accumulo(object):
     def remove_iterator(self, table, iterator, scopes):
         self.client.removeIterator(self.login, table, iterator, scopes)
 
+    @_retried
     def following_key(self, key, part):
         return self.client.getFollowing(key, part)
 
+    @_retried
     def get_max_row(self, table, auths=None, srow=None, sinclude=None, erow=None, einclude=None):
         return self.client.getMaxRow(self.login, table, auths, srow, sinclude, erow, einclude)
 
-    def add_mutations_and_flush(self, table, muts):
+    def add_mutations_and_flush(self, table, muts, coalesce=False):
         """
         Add mutations to a table without the need to create and manage a batch writer.
+        With coalesce=True superseded updates of the same column are dropped, as in BatchWriter.
         """
         if not isinstance(muts, list) and not isinstance(muts, tuple):
             muts = [muts]
         cells = {}
         for mut in muts:
-            cells.setdefault(mut.row, []).extend(mut.updates)
+            _add_updates(cells, mut)
+        if coalesce:
+            cells = dict((row, _coalesce_updates(updates)) for row, updates in cells.iteritems())
         self.client.updateAndFlush(self.login, table, cells)
 
     def create_user(self, user, password):
@@ -285,39 +2151,60 @@ class Accumulo(object):
     def drop_user(self, user):
         self.client.dropLocalUser(self.login, user)
 
+    @_retried
     def list_users(self):
         return self.client.listLocalUsers(self.login)
 
+    @_retried
     def set_user_authorizations(self, user, auths):
         self.client.changeUserAuthorizations(self.login, user, auths)
 
+    @_retried
     def get_user_authorizations(self, user):
         return self.client.getUserAuthorizations(self.login, user)
 
+    @_retried
     def grant_system_permission(self, user, perm):
         self.client.grantSystemPermission(self.login, user, perm)
 
+    @_retried
     def revoke_system_permission(self, user, perm):
         self.client.revokeSystemPermission(self.login, user, perm)
 
+    @_retried
     def has_system_permission(self, user, perm):
         return self.client.hasSystemPermission(self.login, user, perm)
 
+    @_retried
     def grant_table_permission(self, user, table, perm):
         self.client.grantTablePermission(self.login, user, table, perm)
 
+    @_retried
     def revoke_table_permission(self, user, table, perm):
         self.client.revokeTablePermission(self.login, user, table, perm)
 
+    @_retried
     def has_table_permission(self, user, table, perm):
         return self.client.hasTablePermission(self.login, user, table, perm)
 
+    @_retried
     def add_splits(self, table, splits):
         self.client.addSplits(self.login, table, splits)
 
+    @_retried
+    def split_range_by_tablets(self, table, scanrange=None, max_splits=1000):
+        """
+        Returns the proxy Ranges that cut scanrange (the whole table if None) along tablet boundaries,
+        sorted by start key.  The returned ranges can be passed to scan() as the scanrange.
+        """
+        rng = self._get_range(scanrange or Range())
+        ranges = self.client.splitRangeByTablets(self.login, table, rng, max_splits)
+        return sorted(ranges, key=_range_start)
+
     def add_constraint(self, table, class_name):
         return self.client.addConstraint(self.login, table, class_name)
 
+    @_retried
     def list_constraints(self, table):
         return self.client.listConstraints(self.login, table)
 
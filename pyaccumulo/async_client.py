@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import threading
+from Queue import Queue
+
+from pyaccumulo.pool import AccumuloPool
+
+logger = logging.getLogger("pyaccumulo.async_client")
+
+class Future(object):
+    """ Result of a call submitted to AsyncAccumulo """
+    def __init__(self):
+        super(Future, self).__init__()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def _finish(self, result=None, exc_info=None):
+        with self._lock:
+            self._result = result
+            self._exc_info = exc_info
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        for fn in callbacks:
+            self._call(fn)
+
+    def _call(self, fn):
+        # a failing callback must not take down the worker thread that finished the call
+        try:
+            fn(self)
+        except Exception:
+            logger.exception("Future callback %r raised", fn)
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """ Waits for the call to finish and returns its result, re-raising any exception it raised. """
+        if not self._done.wait(timeout):
+            raise Exception("Timed out waiting for result")
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise Exception("Timed out waiting for result")
+        return self._exc_info[1] if self._exc_info else None
+
+    def add_done_callback(self, fn):
+        """ Calls fn(future) once the call finishes, immediately if it already has. """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        self._call(fn)
+
+class AsyncAccumulo(object):
+    """
+    Non-blocking front end to an AccumuloPool.
+
+    Calls return a Future right away and are run by a fixed set of worker threads, each using a pooled
+    connection, so any number of outstanding requests share `workers` proxy connections.
+
+    :param pool: an AccumuloPool, one with max_size=workers is created from kwargs if not given
+    :param workers: number of worker threads
+    """
+    def __init__(self, pool=None, workers=10, **kwargs):
+        super(AsyncAccumulo, self).__init__()
+        self.pool = pool if pool is not None else AccumuloPool(max_size=workers, **kwargs)
+        self._owns_pool = pool is None
+        self._tasks = Queue()
+        self._workers = []
+        for _ in range(workers):
+            t = threading.Thread(target=self._work)
+            t.daemon = True
+            t.start()
+            self._workers.append(t)
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            try:
+                with self.pool.connection() as conn:
+                    result = fn(conn, *args, **kwargs)
+            except:
+                # anything, so the worker lives on and the caller sees the error
+                future._finish(exc_info=sys.exc_info())
+            else:
+                future._finish(result)
+
+    def submit(self, fn, *args, **kwargs):
+        """ Runs fn(conn, *args, **kwargs) on a pooled connection and returns a Future for its result. """
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs))
+        return future
+
+    def scan(self, table, **kwargs):
+        """ Future for the list of Cells returned by Accumulo.scan(table, **kwargs) """
+        return self.submit(lambda conn: list(conn.scan(table, **kwargs)))
+
+    def batch_scan(self, table, **kwargs):
+        """ Future for the list of Cells returned by Accumulo.batch_scan(table, **kwargs) """
+        return self.submit(lambda conn: list(conn.batch_scan(table, **kwargs)))
+
+    def scan_batches(self, table, callback, **kwargs):
+        """
+        Streams a scan to callback(cells) one nextK batch at a time on a worker thread.
+        Returns a Future that completes with the number of cells once the scan is finished.
+        """
+        def run(conn):
+            count = 0
+            options = dict(kwargs)
+            batchsize = options.pop("batchsize", 10)
+            cells = []
+            for cell in conn.scan(table, batchsize=batchsize, **options):
+                cells.append(cell)
+                if len(cells) >= batchsize:
+                    callback(cells)
+                    count += len(cells)
+                    cells = []
+            if cells:
+                callback(cells)
+                count += len(cells)
+            return count
+        return self.submit(run)
+
+    def add_mutations(self, table, muts, **writer_args):
+        """ Writes mutations through a BatchWriter and closes it, the Future completes once they are written. """
+        def run(conn):
+            writer = conn.create_batch_writer(table, **writer_args)
+            writer.add_mutations(muts)
+            writer.close()
+        return self.submit(run)
+
+    def add_mutations_and_flush(self, table, muts):
+        return self.submit(lambda conn: conn.add_mutations_and_flush(table, muts))
+
+    def list_tables(self):
+        return self.submit(lambda conn: conn.list_tables())
+
+    def table_exists(self, table):
+        return self.submit(lambda conn: conn.table_exists(table))
+
+    def create_table(self, table):
+        return self.submit(lambda conn: conn.create_table(table))
+
+    def delete_table(self, table):
+        return self.submit(lambda conn: conn.delete_table(table))
+
+    def rename_table(self, oldtable, newtable):
+        return self.submit(lambda conn: conn.rename_table(oldtable, newtable))
+
+    def close(self):
+        """ Waits for queued calls to finish, then stops the workers. """
+        for _ in self._workers:
+            self._tasks.put(None)
+        for t in self._workers:
+            t.join()
+        if self._owns_pool:
+            self.pool.close()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+from collections import namedtuple
+
+class ScanInfo(namedtuple("ScanInfo", "table options scanner")):
+    """
+    The scan a hook is called for: its table, ScanOptions or BatchScanOptions and proxy scanner id.
+    table and options are None for scans started with perform_scan() on a scanner created elsewhere.
+    """
+    __slots__ = ()
+
+class TraceHooks(object):
+    """
+    Callbacks for the lifecycle of scans and BatchWriters, attached with Accumulo(hooks=...).
+    Subclass it and override the methods of interest, latencies are in milliseconds.
+    Exceptions raised by a hook propagate to the scan or writer call that triggered it.
+    """
+    def scanner_created(self, scan, latency_ms):
+        """ Called after createScanner or createBatchScanner returned the scanner of scan """
+        pass
+
+    def scan_batch(self, scan, cells, nbytes, latency_ms):
+        """
+        Called for each batch of cells fetched, a list of Cells or for columnar scans a ColumnBatch,
+        nbytes is the size of their keys and values.
+        With prefetch, latency_ms is how long the scan waited for the batch rather than the nextK call.
+        """
+        pass
+
+    def scanner_closed(self, scan, ncells):
+        """ Called after closeScanner, ncells is the number of cells fetched by the scan """
+        pass
+
+    def writer_updated(self, writer, cells, nmuts, nbytes, latency_ms):
+        """
+        Called after a BatchWriter sent an update of nmuts mutations, cells is the {row: updates} sent.
+        For an AsyncBatchWriter latency_ms is how long queueing the update took.
+        """
+        pass
+
+    def writer_flushed(self, writer, latency_ms):
+        pass
+
+    def writer_closed(self, writer, latency_ms):
+        pass
+
+class SlowOperationLogger(TraceHooks):
+    """ Logs a warning for every scanner creation, scan batch and writer call that took longer than threshold_ms """
+    def __init__(self, threshold_ms=1000, logger=None):
+        super(SlowOperationLogger, self).__init__()
+        self.threshold_ms = threshold_ms
+        self.logger = logger or logging.getLogger("pyaccumulo.hooks")
+
+    def _check(self, latency_ms, fmt, *args):
+        if latency_ms > self.threshold_ms:
+            self.logger.warning(fmt + " took %.1fms", *(args + (latency_ms,)))
+
+    def scanner_created(self, scan, latency_ms):
+        self._check(latency_ms, "creating scanner on %s with %s", scan.table, scan.options)
+
+    def scan_batch(self, scan, cells, nbytes, latency_ms):
+        self._check(latency_ms, "batch of %d cells (%d bytes) from %s with %s", len(getattr(cells, "rows", cells)), nbytes, scan.table, scan.options)
+
+    def writer_updated(self, writer, cells, nmuts, nbytes, latency_ms):
+        self._check(latency_ms, "update of %d mutations (%d bytes) to %s", nmuts, nbytes, writer.table)
+
+    def writer_flushed(self, writer, latency_ms):
+        self._check(latency_ms, "flushing writer on %s", writer.table)
+
+    def writer_closed(self, writer, latency_ms):
+        self._check(latency_ms, "closing writer on %s", writer.table)
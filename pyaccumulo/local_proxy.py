@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stand-in for the Accumulo proxy that runs in the current process, for tests and benchmarks without a cluster.
+
+LocalProxy serves the generated AccumuloProxy.Processor over a real socket with TFramedTransport, so clients go
+through the same encoding, framing and scanner paging as against a real proxy.  Tables live in memory as sorted
+lists of entries and keep one version per column, like tables created with the VersioningIterator.  Visibility
+labels and authorizations are stored but not evaluated, and scan iterators are ignored.
+"""
+
+import itertools
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from thrift.Thrift import TType, TMessageType, TApplicationException
+from thrift.transport import TSocket
+from thrift.transport import TTransport
+from thrift.transport.TTransport import TTransportException
+
+from pyaccumulo import Accumulo, _get_protocol
+from pyaccumulo.proxy import AccumuloProxy
+from pyaccumulo.proxy.ttypes import Key, KeyValue, KeyValueAndPeek, ScanResult, Range, \
+    AccumuloException, TableNotFoundException, TableExistsException, UnknownScanner, UnknownWriter, NoMoreEntriesException
+
+_MAX_TS = 2**63 - 1
+
+def _full_key(key):
+    """ Sort tuple of a proxy Key, unset fields are the smallest possible values as in Accumulo """
+    ts = key.timestamp if key.timestamp is not None else _MAX_TS
+    return (key.row or '', key.colFamily or '', key.colQualifier or '', key.colVisibility or '', -ts)
+
+class _Table(object):
+    """
+    Entries are tuples (row, cf, cq, cv, -ts, 0 for a delete or 1 for a put, -write sequence, value), so
+    sorting puts the newest version of each column first and a delete before a put with the same timestamp.
+    """
+    def __init__(self):
+        self.entries = []
+        self.pending = []
+        self.splits = []
+
+    def add(self, row, update, ts, seq):
+        if update.timestamp is not None:
+            ts = update.timestamp
+        self.pending.append((row, update.colFamily or '', update.colQualifier or '', update.colVisibility or '', -ts,
+                             0 if update.deleteCell else 1, -seq, update.value or ''))
+
+    def compact(self):
+        """ Merges pending writes into entries, keeping only the newest version of each column """
+        if not self.pending:
+            return self.entries
+        merged = self.entries + self.pending
+        merged.sort()
+        entries = []
+        last = None
+        for e in merged:
+            column = e[:4]
+            if column == last:
+                continue
+            last = column
+            if e[5]:
+                entries.append(e)
+        self.entries = entries
+        self.pending = []
+        return entries
+
+def _tablet_ranges(splits, rng):
+    """ Splits the proxy Range rng (None for everything) at the table's split rows, one piece per tablet """
+    pieces = []
+    prev = None
+    for end in list(splits) + [None]:
+        start = Key(row=prev + "\0") if prev is not None else None
+        stop = Key(row=end + "\0") if end is not None else None
+        piece = Range(start=start, startInclusive=True, stop=stop, stopInclusive=False)
+        if rng is not None:
+            if rng.start is not None and (start is None or _full_key(rng.start) >= _full_key(start)):
+                piece.start, piece.startInclusive = rng.start, rng.startInclusive
+            if rng.stop is not None and (stop is None or _full_key(rng.stop) < _full_key(stop)):
+                piece.stop, piece.stopInclusive = rng.stop, rng.stopInclusive
+        if piece.start is None or piece.stop is None or _full_key(piece.start) < _full_key(piece.stop) or \
+                (_full_key(piece.start) == _full_key(piece.stop) and piece.startInclusive and piece.stopInclusive):
+            pieces.append(piece)
+        prev = end
+    return pieces
+
+def _scan_entries(entries, ranges, columns):
+    """ Yields the entries within the proxy Ranges (None for everything) whose column is in columns """
+    families = None
+    if columns:
+        families = {}
+        for c in columns:
+            qualifiers = families.setdefault(c.colFamily, set())
+            qualifiers.add(c.colQualifier)
+    for rng in ranges or [None]:
+        pos = 0
+        stop = stop_inclusive = None
+        if rng is not None:
+            if rng.start is not None:
+                start = _full_key(rng.start)
+                pos = bisect_left(entries, start if rng.startInclusive else start + (2,))
+            if rng.stop is not None:
+                stop = _full_key(rng.stop)
+                stop_inclusive = rng.stopInclusive
+        for i in xrange(pos, len(entries)):
+            e = entries[i]
+            if stop is not None:
+                key = e[:5]
+                if key > stop or (key == stop and not stop_inclusive):
+                    break
+            if families is not None:
+                qualifiers = families.get(e[1])
+                if qualifiers is None or (None not in qualifiers and e[2] not in qualifiers):
+                    continue
+            yield e
+
+def _key_value(e):
+    return KeyValue(Key(row=e[0], colFamily=e[1], colQualifier=e[2], colVisibility=e[3], timestamp=-e[4]), e[7])
+
+class MemoryProxyHandler(AccumuloProxy.Iface):
+    """
+    AccumuloProxy handler backed by in-memory tables, covering table management, writers, scanners and splits.
+    Methods it does not implement return nothing, which the client reports as a missing result.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._writers = {}
+        self._scanners = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count(1)
+
+    def _table(self, name, error=TableNotFoundException):
+        """ error is the exception type the method may raise, calls that do not declare TableNotFoundException wrap it in AccumuloException """
+        table = self._tables.get(name)
+        if table is None:
+            raise error(msg="Table %s does not exist" % name)
+        return table
+
+    def _write(self, table, cells):
+        ts = int(time.time() * 1000)
+        for row, updates in cells.iteritems():
+            for u in updates:
+                table.add(row, u, ts, self._seq.next())
+
+    def login(self, principal, loginProperties):
+        return "login:%s" % principal
+
+    def listTables(self, login):
+        with self._lock:
+            return set(self._tables)
+
+    def tableExists(self, login, tableName):
+        with self._lock:
+            return tableName in self._tables
+
+    def createTable(self, login, tableName, versioningIter, type):
+        with self._lock:
+            if tableName in self._tables:
+                raise TableExistsException(msg="Table %s exists" % tableName)
+            self._tables[tableName] = _Table()
+
+    def deleteTable(self, login, tableName):
+        with self._lock:
+            self._table(tableName)
+            del self._tables[tableName]
+
+    def renameTable(self, login, oldTableName, newTableName):
+        with self._lock:
+            self._table(oldTableName)
+            if newTableName in self._tables:
+                raise TableExistsException(msg="Table %s exists" % newTableName)
+            self._tables[newTableName] = self._tables.pop(oldTableName)
+
+    def addSplits(self, login, tableName, splits):
+        with self._lock:
+            table = self._table(tableName)
+            table.splits = sorted(set(table.splits) | set(splits))
+
+    def getSplits(self, login, tableName, maxSplits):
+        with self._lock:
+            splits = self._table(tableName).splits
+            if maxSplits and len(splits) > maxSplits:
+                step = float(len(splits)) / maxSplits
+                splits = [splits[int(i * step)] for i in xrange(maxSplits)]
+            return list(splits)
+
+    def splitRangeByTablets(self, login, tableName, range, maxSplits):
+        with self._lock:
+            return _tablet_ranges(self._table(tableName).splits, range)
+
+    def createWriter(self, login, tableName, opts):
+        with self._lock:
+            self._table(tableName, AccumuloException)
+            writer = "writer%d" % self._ids.next()
+            self._writers[writer] = tableName
+            return writer
+
+    def _check_writer(self, writer):
+        if writer not in self._writers:
+            raise UnknownWriter(msg="Unknown writer %s" % writer)
+
+    def update(self, writer, cells):
+        with self._lock:
+            # update is oneway, so a writer or table that is gone is only reported by the next flush
+            table = self._tables.get(self._writers.get(writer))
+            if table is not None:
+                self._write(table, cells)
+
+    def flush(self, writer):
+        with self._lock:
+            self._check_writer(writer)
+
+    def closeWriter(self, writer):
+        with self._lock:
+            self._check_writer(writer)
+            del self._writers[writer]
+
+    def updateAndFlush(self, login, tableName, cells):
+        with self._lock:
+            self._write(self._table(tableName, AccumuloException), cells)
+
+    def _create_scanner(self, tableName, ranges, columns):
+        with self._lock:
+            entries = self._table(tableName, AccumuloException).compact()
+            scanner = "scanner%d" % self._ids.next()
+            self._scanners[scanner] = [_scan_entries(entries, ranges, columns), None]
+            return scanner
+
+    def createScanner(self, login, tableName, options):
+        return self._create_scanner(tableName, [options.range] if options and options.range else None, options and options.columns)
+
+    def createBatchScanner(self, login, tableName, options):
+        return self._create_scanner(tableName, options and options.ranges, options and options.columns)
+
+    def _state(self, scanner):
+        state = self._scanners.get(scanner)
+        if state is None:
+            raise UnknownScanner(msg="Unknown scanner %s" % scanner)
+        if state[1] is None:
+            state[1] = next(state[0], None)
+        return state
+
+    def _take(self, state):
+        e = state[1]
+        state[1] = next(state[0], None)
+        return e
+
+    def nextK(self, scanner, k):
+        with self._lock:
+            state = self._state(scanner)
+            results = []
+            while state[1] is not None and len(results) < k:
+                results.append(_key_value(self._take(state)))
+            return ScanResult(results=results, more=state[1] is not None)
+
+    def hasNext(self, scanner):
+        with self._lock:
+            return self._state(scanner)[1] is not None
+
+    def nextEntry(self, scanner):
+        with self._lock:
+            state = self._state(scanner)
+            if state[1] is None:
+                raise NoMoreEntriesException(msg="No more entries")
+            kv = _key_value(self._take(state))
+            return KeyValueAndPeek(keyValue=kv, hasNext=state[1] is not None)
+
+    def closeScanner(self, scanner):
+        with self._lock:
+            if self._scanners.pop(scanner, None) is None:
+                raise UnknownScanner(msg="Unknown scanner %s" % scanner)
+
+class _Processor(AccumuloProxy.Processor):
+    """
+    Processor that replies with a TApplicationException when the handler raises an exception the method does
+    not declare, instead of dropping the connection as the generated one does.
+    """
+    def process(self, iprot, oprot):
+        name, type, seqid = iprot.readMessageBegin()
+        process = self._processMap.get(name)
+        if process is None:
+            iprot.skip(TType.STRUCT)
+            iprot.readMessageEnd()
+            error = TApplicationException(TApplicationException.UNKNOWN_METHOD, "Unknown function %s" % name)
+        else:
+            try:
+                process(self, seqid, iprot, oprot)
+                return True
+            except TTransportException:
+                raise
+            except Exception, e:
+                if type == TMessageType.ONEWAY:
+                    return True
+                error = TApplicationException(TApplicationException.UNKNOWN, "%s: %s" % (e.__class__.__name__, e))
+        oprot.writeMessageBegin(name, TMessageType.EXCEPTION, seqid)
+        error.write(oprot)
+        oprot.writeMessageEnd()
+        oprot.trans.flush()
+        return True
+
+class LocalProxy(object):
+    """
+    Serves a MemoryProxyHandler on a local port from background threads, one per client connection.
+
+        with LocalProxy(protocol="accelerated") as proxy:
+            conn = proxy.connect()
+
+    :param port: port to listen on, 0 picks a free one which is then available as the port attribute
+    :param protocol: "compact", "binary" or "accelerated", as for Accumulo
+    """
+    def __init__(self, host="127.0.0.1", port=0, protocol="compact", handler=None):
+        super(LocalProxy, self).__init__()
+        self.host = host
+        self.protocol = protocol
+        self.handler = handler if handler is not None else MemoryProxyHandler()
+        self._processor = _Processor(self.handler)
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(128)
+        self.port = self._listener.getsockname()[1]
+        self._clients = []
+        self._thread = None
+
+    def start(self):
+        """ Serves connections from a background thread """
+        self._thread = threading.Thread(target=self.serve)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def serve(self):
+        """ Serves connections from the calling thread until stop() is called """
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except socket.error:
+                return
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._clients.append(client)
+            t = threading.Thread(target=self._serve, args=(client,))
+            t.daemon = True
+            t.start()
+
+    def _serve(self, client):
+        sock = TSocket.TSocket()
+        sock.setHandle(client)
+        transport = TTransport.TFramedTransport(sock)
+        protocol = _get_protocol(self.protocol, transport)
+        try:
+            while True:
+                self._processor.process(protocol, protocol)
+        except (TTransportException, socket.error, EOFError):
+            pass
+        finally:
+            transport.close()
+
+    def connect(self, **kwargs):
+        """ Returns an Accumulo connection to this proxy, kwargs are passed to the Accumulo constructor """
+        return Accumulo(host=self.host, port=self.port, protocol=self.protocol, **kwargs)
+
+    def stop(self):
+        """ Stops accepting connections and closes the open ones """
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._listener.close()
+        for client in self._clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
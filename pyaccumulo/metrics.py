@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Per RPC instrumentation for Accumulo connections, enabled with Accumulo(metrics=RpcMetrics()).
+
+Connections created without metrics use the plain client and transport classes, so instrumentation costs
+nothing when it is off.  With metrics, every proxy method called through conn.client records its latency and
+the bytes of the frames written and read at the TFramedTransport level.  Calls queued on a Pipeline are
+not recorded.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from thrift.transport import TTransport
+
+from pyaccumulo.proxy import AccumuloProxy
+
+# upper bounds of the latency histogram buckets, in milliseconds, the last bucket holds everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+class CountingFramedTransport(TTransport.TFramedTransport):
+    """ TFramedTransport counting the bytes of the frames it writes and reads, including their length prefix """
+    def __init__(self, trans):
+        TTransport.TFramedTransport.__init__(self, trans)
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def write(self, buf):
+        self.bytes_written += len(buf)
+        TTransport.TFramedTransport.write(self, buf)
+
+    def flush(self):
+        self.bytes_written += 4
+        TTransport.TFramedTransport.flush(self)
+
+    def readFrame(self):
+        TTransport.TFramedTransport.readFrame(self)
+        self.bytes_read += len(self.cstringio_buf.getvalue()) + 4
+
+class _MethodStats(object):
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "bytes_out", "bytes_in", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, p):
+        """ Upper bound of the bucket holding the p-th percentile latency (max_ms for the overflow bucket) """
+        target = p / 100.0 * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "latency_ms": {
+                "total": self.total_ms,
+                "mean": self.total_ms / self.calls if self.calls else 0.0,
+                "max": self.max_ms,
+                "p50": self.percentile(50),
+                "p99": self.percentile(99),
+                "histogram": zip(LATENCY_BUCKETS_MS + (None,), self.buckets),
+            },
+        }
+
+class RpcMetrics(object):
+    """
+    Thread safe per method call counts, error counts, latency histograms and request/response bytes,
+    which may be shared by several connections (e.g. through AccumuloPool(metrics=...)).
+
+    :param exporters: callables taking a snapshot, called by export()
+    """
+    def __init__(self, exporters=()):
+        super(RpcMetrics, self).__init__()
+        self.exporters = list(exporters)
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def record(self, method, latency_ms, bytes_out=0, bytes_in=0, error=False):
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = _MethodStats()
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            stats.total_ms += latency_ms
+            if latency_ms > stats.max_ms:
+                stats.max_ms = latency_ms
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.buckets[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+
+    def snapshot(self):
+        """ Returns {method: {calls, errors, bytes_out, bytes_in, latency_ms: {total, mean, max, p50, p99, histogram}}} """
+        with self._lock:
+            return dict((method, stats.to_dict()) for method, stats in self._methods.iteritems())
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+
+    def export(self, reset=False):
+        """ Passes a snapshot to every exporter, then clears the metrics if reset is set """
+        with self._lock:
+            snapshot = dict((method, stats.to_dict()) for method, stats in self._methods.iteritems())
+            if reset:
+                self._methods = {}
+        for exporter in self.exporters:
+            exporter(snapshot)
+        return snapshot
+
+class LogExporter(object):
+    """ Exporter logging one line per method """
+    def __init__(self, logger=None, level=logging.INFO):
+        super(LogExporter, self).__init__()
+        self.logger = logger or logging.getLogger("pyaccumulo.metrics")
+        self.level = level
+
+    def __call__(self, snapshot):
+        for method, stats in sorted(snapshot.iteritems()):
+            latency = stats["latency_ms"]
+            self.logger.log(self.level, "%s calls=%d errors=%d mean=%.1fms p99<=%.0fms max=%.1fms out=%dB in=%dB",
+                            method, stats["calls"], stats["errors"], latency["mean"], latency["p99"], latency["max"],
+                            stats["bytes_out"], stats["bytes_in"])
+
+def _timed(name, method):
+    def call(self, *args, **kwargs):
+        trans = self._oprot.trans
+        written = trans.bytes_written
+        read = trans.bytes_read
+        start = time.time()
+        error = True
+        try:
+            result = method(self, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            self.metrics.record(name, (time.time() - start) * 1000, trans.bytes_written - written, trans.bytes_read - read, error)
+    call.__name__ = method.__name__
+    call.__doc__ = method.__doc__
+    return call
+
+_RPC_METHODS = [name for name, value in vars(AccumuloProxy.Iface).items() if callable(value) and not name.startswith("_")]
+# client methods recorded under the name of the proxy method they call
+_ALIASES = {"nextK_cells": "nextK"}
+_instrumented = {}
+
+def instrumented_client_class(base):
+    """
+    Returns a subclass of the client class base whose proxy methods record their calls in self.metrics.
+    The client's protocol must write to a CountingFramedTransport.
+    """
+    cls = _instrumented.get(base)
+    if cls is None:
+        attrs = {}
+        for name in _RPC_METHODS + _ALIASES.keys():
+            method = getattr(base, name, None)
+            if method is not None:
+                attrs[name] = _timed(_ALIASES.get(name, name), method.im_func)
+        # the generated client is an old style class, so build the subclass with the metaclass of base
+        cls = _instrumented[base] = type(base)("Instrumented" + base.__name__, (base,), attrs)
+    return cls
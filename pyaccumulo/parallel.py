@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import sys
+import threading
+from Queue import Queue, Full
+
+_DONE = object()
+
+def _put(out, item, stopped):
+    """ Queues an item for the consumer, returns False once the scan has been abandoned """
+    while not stopped.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+class _Worker(threading.Thread):
+    def __init__(self, pool, pieces, scan, stopped):
+        super(_Worker, self).__init__()
+        self.daemon = True
+        self._pool = pool
+        self._pieces = pieces
+        self._scan = scan
+        self._stopped = stopped
+
+    def run(self):
+        while not self._stopped.is_set():
+            piece = self._pieces.get()
+            if piece is None or self._stopped.is_set():
+                return
+            rng, out = piece
+            try:
+                with self._pool.connection() as conn:
+                    self._scan_piece(conn, rng, out)
+            except Exception:
+                _put(out, sys.exc_info(), self._stopped)
+
+    def _scan_piece(self, conn, rng, out):
+        scan = self._scan
+        open_scan = conn._create_scanner(scan.table, rng, scan.cols, scan.auths, scan.iterators, scan.bufsize)
+        batches = conn._perform_batches(open_scan, scan.batchsize, 0)
+        for cells in batches:
+            if cells and not _put(out, cells, self._stopped):
+                # closes the scanner
+                batches.close()
+                return
+        _put(out, _DONE, self._stopped)
+
+class ParallelScan(object):
+    """
+    Scans a range of a table by cutting it along tablet boundaries with splitRangeByTablets and scanning the
+    pieces concurrently, each on its own connection from an AccumuloPool.
+
+    With ordered=True cells come back in key order: the pieces do not overlap, so each piece is drained in
+    start key order while the later pieces are fetched ahead, up to `depth` batches each.  With ordered=False
+    batches are yielded as soon as any piece returns them.
+
+    Iterate over it for Cells, or call batches() for the lists of Cells returned by each nextK call.
+    """
+    def __init__(self, pool, table, scanrange=None, cols=None, auths=None, iterators=None, bufsize=None,
+                 batchsize=1000, max_splits=1000, threads=None, ordered=True, depth=2):
+        super(ParallelScan, self).__init__()
+        self.pool = pool
+        self.table = table
+        self.scanrange = scanrange
+        self.cols = cols
+        self.auths = auths
+        self.iterators = iterators
+        self.bufsize = bufsize
+        self.batchsize = batchsize
+        self.max_splits = max_splits
+        self.threads = threads or pool.max_size
+        self.ordered = ordered
+        self.depth = depth
+
+    def _get(self, out):
+        item = out.get()
+        if isinstance(item, tuple):
+            raise item[0], item[1], item[2]
+        return item
+
+    def __iter__(self):
+        for cells in self.batches():
+            for cell in cells:
+                yield cell
+
+    def batches(self):
+        with self.pool.connection() as conn:
+            ranges = conn.split_range_by_tablets(self.table, self.scanrange, self.max_splits)
+
+        pieces = Queue()
+        if self.ordered:
+            outs = [Queue(maxsize=self.depth) for _ in ranges]
+        else:
+            outs = [Queue(maxsize=self.depth * self.threads)] * len(ranges)
+        for rng, out in zip(ranges, outs):
+            pieces.put((rng, out))
+
+        stopped = threading.Event()
+        workers = [_Worker(self.pool, pieces, self, stopped) for _ in range(min(self.threads, len(ranges)))]
+        for w in workers:
+            pieces.put(None)
+            w.start()
+
+        try:
+            if self.ordered:
+                for out in outs:
+                    while True:
+                        cells = self._get(out)
+                        if cells is _DONE:
+                            break
+                        yield cells
+            else:
+                remaining = len(ranges)
+                while remaining:
+                    cells = self._get(outs[0])
+                    if cells is _DONE:
+                        remaining -= 1
+                    else:
+                        yield cells
+        finally:
+            stopped.set()
+            for w in workers:
+                w.join()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from contextlib import contextmanager
+
+from pyaccumulo import Accumulo, _TRANSIENT_ERRORS
+
+def _ping(conn):
+    conn.table_exists("!METADATA")
+
+class AccumuloPool(object):
+    """
+    Thread safe pool of logged in Accumulo connections.
+
+    AccumuloProxy.Client is not safe to share between threads, so each connection is handed to one
+    thread at a time by get() and returned with put(), or managed with the connection() context manager.
+
+    :param max_size: maximum number of open connections, get() blocks once they are all in use
+    :param idle_timeout: seconds a connection may sit unused in the pool before it is closed
+    :param check_interval: connections unused for longer than this many seconds are health checked before being handed out
+    :param health_check: callable taking a connection that raises if the connection is unusable
+    :param kwargs: passed to the Accumulo constructor (host, port, user, password, ...)
+    """
+    def __init__(self, max_size=10, idle_timeout=300, check_interval=30, health_check=_ping, **kwargs):
+        super(AccumuloPool, self).__init__()
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.health_check = health_check
+        self._conn_args = kwargs
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._closed = False
+
+    def _connect(self):
+        return Accumulo(**self._conn_args)
+
+    def _close_conn(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now):
+        expired = [e for e in self._idle if now - e[1] > self.idle_timeout]
+        if expired:
+            self._idle = [e for e in self._idle if now - e[1] <= self.idle_timeout]
+            self._size -= len(expired)
+            self._cond.notify_all()
+        return [conn for conn, _ in expired]
+
+    def _is_healthy(self, conn):
+        try:
+            self.health_check(conn)
+            return True
+        except Exception:
+            return False
+
+    def get(self, timeout=None):
+        """
+        Returns a logged in connection, opening a new one if none are idle and the pool is not full.
+        :param timeout: seconds to wait for a connection when the pool is full, None waits forever
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("Cannot get a connection from a closed pool")
+                now = time.time()
+                expired = self._evict_idle(now)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                if deadline is not None and now >= deadline:
+                    raise Exception("Timed out waiting for a connection")
+                self._cond.wait(None if deadline is None else deadline - now)
+
+        for e in expired:
+            self._close_conn(e)
+
+        if conn is not None and now - last_used > self.check_interval and not self._is_healthy(conn):
+            self._close_conn(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except:
+                self._discarded()
+                raise
+        return conn
+
+    def put(self, conn, discard=False):
+        """
+        Returns a connection to the pool.
+        :param discard: close the connection instead of reusing it, e.g. after a transport error
+        """
+        with self._cond:
+            if not discard and not self._closed:
+                self._idle.append((conn, time.time()))
+                self._cond.notify()
+                return
+        self._close_conn(conn)
+        self._discarded()
+
+    def _discarded(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that checks out a connection and returns it to the pool afterwards.
+        Connections that raised a TTransportException or socket.error are closed and replaced on the next get().
+        """
+        conn = self.get(timeout)
+        try:
+            yield conn
+        except _TRANSIENT_ERRORS:
+            self.put(conn, discard=True)
+            raise
+        except:
+            self.put(conn)
+            raise
+        else:
+            self.put(conn)
+
+    def size(self):
+        """ Returns (open connections, idle connections) """
+        with self._cond:
+            return self._size, len(self._idle)
+
+    def close(self):
+        """ Closes idle connections; connections still checked out are closed when they are put back. """
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_conn(conn)
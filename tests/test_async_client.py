@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from contextlib import contextmanager
+from mock import Mock
+
+from pyaccumulo.async_client import AsyncAccumulo, Future
+
+
+class FakePool(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+class FutureTest(unittest.TestCase):
+    def test_result(self):
+        f = Future()
+        self.assertFalse(f.done())
+        with self.assertRaises(Exception):
+            f.result(timeout=0.01)
+        f._finish("res")
+        self.assertTrue(f.done())
+        self.assertEquals("res", f.result())
+        self.assertIsNone(f.exception())
+
+    def test_callbacks(self):
+        f = Future()
+        cb = Mock()
+        f.add_done_callback(cb)
+        f._finish("res")
+        cb.assert_called_with(f)
+
+        cb = Mock()
+        f.add_done_callback(cb)
+        cb.assert_called_with(f)
+
+    def test_failing_callback(self):
+        f = Future()
+        cb = Mock()
+        f.add_done_callback(Mock(side_effect=ValueError()))
+        f.add_done_callback(cb)
+        f._finish("res")
+        cb.assert_called_with(f)
+        self.assertEquals("res", f.result())
+        f.add_done_callback(Mock(side_effect=ValueError()))
+
+class AsyncAccumuloTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = Mock()
+        self.client = AsyncAccumulo(pool=FakePool(self.conn), workers=2)
+        self.addCleanup(self.client.close)
+
+    def test_failing_callbacks_keep_workers(self):
+        self.conn.table_exists = Mock(return_value=True)
+        for _ in range(4):
+            self.client.table_exists("mytable").add_done_callback(Mock(side_effect=ValueError()))
+        self.assertTrue(self.client.table_exists("mytable").result(timeout=5))
+        self.assertTrue(all(t.is_alive() for t in self.client._workers))
+
+    def test_table_ops(self):
+        self.conn.table_exists = Mock(return_value=True)
+        self.assertTrue(self.client.table_exists("mytable").result(timeout=5))
+        self.conn.table_exists.assert_called_with("mytable")
+
+        self.client.create_table("mytable").result(timeout=5)
+        self.conn.create_table.assert_called_with("mytable")
+
+        self.client.rename_table("mytable", "t2").result(timeout=5)
+        self.conn.rename_table.assert_called_with("mytable", "t2")
+
+    def test_scan(self):
+        self.conn.scan = Mock(return_value=iter(["c1", "c2"]))
+        self.assertEquals(["c1", "c2"], self.client.scan("mytable", batchsize=100).result(timeout=5))
+        self.conn.scan.assert_called_with("mytable", batchsize=100)
+
+    def test_scan_batches(self):
+        self.conn.scan = Mock(return_value=iter(["c1", "c2", "c3"]))
+        batches = []
+        self.assertEquals(3, self.client.scan_batches("mytable", batches.append, batchsize=2).result(timeout=5))
+        self.assertEquals([["c1", "c2"], ["c3"]], batches)
+
+    def test_add_mutations(self):
+        writer = Mock()
+        self.conn.create_batch_writer = Mock(return_value=writer)
+        self.client.add_mutations("mytable", ["m1"]).result(timeout=5)
+        writer.add_mutations.assert_called_with(["m1"])
+        writer.close.assert_called_with()
+
+    def test_error(self):
+        self.conn.delete_table = Mock(side_effect=ValueError("no table"))
+        f = self.client.delete_table("mytable")
+        with self.assertRaises(ValueError):
+            f.result(timeout=5)
+        self.assertIsInstance(f.exception(), ValueError)
@@ -14,12 +14,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import tempfile
+import threading
 import unittest
 
 import pyaccumulo
 from pyaccumulo import *
-from mock import Mock
-from pyaccumulo.proxy.ttypes import IteratorScope, PartialKey, SystemPermission, TablePermission
+from mock import Mock, call
+from pyaccumulo.proxy import AccumuloProxy
+from thrift.Thrift import TMessageType, TApplicationException
+from thrift.transport import TTransport
+from thrift.transport.TTransport import TTransportException
+from pyaccumulo.proxy.ttypes import UnknownScanner, TableNotFoundException,  IteratorScope, PartialKey, SystemPermission, TablePermission, KeyValue, ScanResult
 
 
 class AccumuloTest(unittest.TestCase):
@@ -78,6 +85,24 @@ class AccumuloTest(unittest.TestCase):
         conn.rename_table("mytable", "newtable")
         conn.client.renameTable.assert_called_with("Login", "mytable", "newtable")
 
+    def test_protocol(self):
+        self.assertIsInstance(Accumulo(_connect=False).protocol, TCompactProtocol.TCompactProtocol)
+        self.assertIsInstance(Accumulo(_connect=False, protocol="binary").protocol, TBinaryProtocol.TBinaryProtocol)
+        self.assertIsInstance(Accumulo(_connect=False, protocol="accelerated").protocol, TBinaryProtocol.TBinaryProtocol)
+
+        with self.assertRaises(Exception):
+            Accumulo(_connect=False, protocol="json")
+
+    def test_accelerated_protocol_fallback(self):
+        fb = pyaccumulo.fastbinary
+        try:
+            pyaccumulo.fastbinary = object()
+            self.assertIs(TBinaryProtocol.TBinaryProtocolAccelerated, Accumulo(_connect=False, protocol="accelerated").protocol.__class__)
+            pyaccumulo.fastbinary = None
+            self.assertIs(TBinaryProtocol.TBinaryProtocol, Accumulo(_connect=False, protocol="accelerated").protocol.__class__)
+        finally:
+            pyaccumulo.fastbinary = fb
+
     def test_get_range(self):
         conn = Accumulo(_connect=False)
         r = Mock()
@@ -127,8 +152,91 @@ class AccumuloTest(unittest.TestCase):
     def test_batch_scan(self):
         pass
 
+    def _get_scan_results(self):
+        return [
+            ScanResult(results=[KeyValue(Key(row="r01", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=1), "v1"),
+                                KeyValue(Key(row="r02", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=2), "v2")], more=True),
+            ScanResult(results=[KeyValue(Key(row="r03", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=3), "v3")], more=False),
+        ]
+
     def test_perform_scan(self):
-        pass
+        conn = self._get_mock_connection()
+        conn.client.nextK = Mock(side_effect=self._get_scan_results())
+
+        cells = list(conn.perform_scan("scanner1", 2))
+        self.assertEquals([Cell("r01", "cf", "cq", "", 1, "v1"), Cell("r02", "cf", "cq", "", 2, "v2"), Cell("r03", "cf", "cq", "", 3, "v3")], cells)
+        conn.client.nextK.assert_called_with("scanner1", 2)
+        self.assertEquals(2, conn.client.nextK.call_count)
+        conn.client.closeScanner.assert_called_with("scanner1")
+
+    def test_perform_scan_prefetch(self):
+        conn = self._get_mock_connection()
+        conn.client.nextK = Mock(side_effect=self._get_scan_results())
+
+        cells = list(conn.perform_scan("scanner1", 2, prefetch=2))
+        self.assertEquals(["r01", "r02", "r03"], [c.row for c in cells])
+        self.assertEquals(2, conn.client.nextK.call_count)
+        conn.client.closeScanner.assert_called_with("scanner1")
+
+    def test_perform_scan_prefetch_error(self):
+        conn = self._get_mock_connection()
+        conn.client.nextK = Mock(side_effect=[self._get_scan_results()[0], ValueError("broken")])
+
+        scan = conn.perform_scan("scanner1", 2, prefetch=1)
+        self.assertEquals("r01", next(scan).row)
+        self.assertEquals("r02", next(scan).row)
+        with self.assertRaises(ValueError):
+            next(scan)
+
+    def test_scan_rows(self):
+        conn = self._get_mock_connection()
+        results = self._get_scan_results()
+        results[1].results[0].key.row = "r02"
+        conn.client.nextK = Mock(side_effect=results)
+
+        rows = [(row, [c.val for c in cells]) for row, cells in conn.scan_rows("mytable", batchsize=2)]
+        self.assertEquals([("r01", ["v1"]), ("r02", ["v2", "v3"])], rows)
+        conn.client.createScanner.assert_called_with("Login", "mytable", ScanOptions(None, None, None, None, None))
+
+    def test_perform_columnar_scan(self):
+        numpy = pyaccumulo.numpy
+        try:
+            pyaccumulo.numpy = None
+            conn = self._get_mock_connection()
+            conn.client.nextK = Mock(side_effect=self._get_scan_results())
+
+            batches = list(conn.perform_columnar_scan("scanner1", 2))
+            self.assertEquals(2, len(batches))
+            self.assertEquals(["r01", "r02"], batches[0].rows)
+            self.assertEquals(["cf", "cf"], batches[0].cfs)
+            self.assertEquals(["cq", "cq"], batches[0].cqs)
+            self.assertEquals(["", ""], batches[0].cvs)
+            self.assertEquals([1, 2], list(batches[0].timestamps))
+            self.assertEquals(8, batches[0].timestamps.itemsize)
+            self.assertEquals(["v3"], batches[1].values)
+            conn.client.closeScanner.assert_called_with("scanner1")
+        finally:
+            pyaccumulo.numpy = numpy
+
+    @unittest.skipIf(pyaccumulo.numpy is None, "numpy is not installed")
+    def test_perform_columnar_scan_numpy(self):
+        conn = self._get_mock_connection()
+        conn.client.nextK = Mock(side_effect=self._get_scan_results())
+
+        batch = next(conn.perform_columnar_scan("scanner1", 2))
+        self.assertEquals(pyaccumulo.numpy.int64, batch.timestamps.dtype)
+        self.assertEquals([1, 2], batch.timestamps.tolist())
+        self.assertEquals(["r01", "r02"], batch.rows.tolist())
+
+    def test_perform_scan_adaptive(self):
+        conn = self._get_mock_connection()
+        conn.client.nextK = Mock(side_effect=self._get_scan_results())
+
+        sizer = AdaptiveBatchSize(initial=2, target_latency_ms=10000)
+        cells = list(conn.perform_scan("scanner1", sizer))
+        self.assertEquals(3, len(cells))
+        self.assertEquals([2, 4], sizer.sizes)
+        self.assertEquals(conn.client.nextK.call_args_list[1][0], ("scanner1", 4))
 
     def test_get_iterator_settings(self):
         conn = Accumulo(_connect=False)
@@ -185,6 +293,16 @@ class AccumuloTest(unittest.TestCase):
         conn.client.getMaxRow.assert_called_with("Login", "mytable", ["auth1", "auth2"], "aabb", True, "bbaa", False)
         self.assertEqual(row, "aabe")
 
+    def test_update_and_flush_compact_mutations(self):
+        conn = Accumulo(_connect=False)
+        conn.client.send_updateAndFlush = Mock()
+        conn.client.recv_updateAndFlush = Mock()
+        m = CompactMutation("r01")
+        m.put(cf="cf", cq="cq", val="v")
+        conn.login = "Login"
+        conn.add_mutations_and_flush("mytable", [m])
+        conn.client.send_updateAndFlush.assert_called_with("Login", "mytable", {"r01": m.updates})
+
     def test_add_mutations_and_flush(self):
         conn = self._get_mock_connection()
         conn.client.updateAndFlush = Mock()
@@ -270,6 +388,17 @@ class AccumuloTest(unittest.TestCase):
         conn.add_splits("mytable", ["aa", "bb", "cc"])
         conn.client.addSplits.assert_called_with("Login", "mytable", ["aa", "bb", "cc"])
 
+    def test_split_range_by_tablets(self):
+        conn = self._get_mock_connection()
+        r1 = Range(srow="m").to_range()
+        r2 = Range(erow="m", einclude=False).to_range()
+        conn.client.splitRangeByTablets = Mock(return_value=[r1, r2])
+        self.assertEquals([r2, r1], conn.split_range_by_tablets("mytable", max_splits=10))
+        conn.client.splitRangeByTablets.assert_called_with("Login", "mytable", pyaccumulo.proxy.ttypes.Range(startInclusive=True, stopInclusive=True), 10)
+
+        conn.split_range_by_tablets("mytable", Range(srow="a"))
+        conn.client.splitRangeByTablets.assert_called_with("Login", "mytable", Range(srow="a").to_range(), 1000)
+
     def test_add_constraints(self):
         conn = self._get_mock_connection()
         conn.client.addConstraint = Mock(return_value=True)
@@ -291,6 +420,387 @@ class AccumuloTest(unittest.TestCase):
         conn.remove_constraint("mytable", 1)
         conn.client.removeConstraint.assert_called_with("Login", "mytable", 1)
 
+class RetryTest(unittest.TestCase):
+    def _get_mock_connection(self):
+        conn = Accumulo(_connect=False, retry=RetryPolicy(max_attempts=3, jitter=0, sleep=self.slept.append))
+        conn.client = Mock()
+        conn.login = "Login"
+        conn.reconnect = Mock()
+        return conn
+
+    def setUp(self):
+        self.slept = []
+
+    def test_call(self):
+        policy = RetryPolicy(max_attempts=3, jitter=0, sleep=self.slept.append)
+        reconnect = Mock()
+        fn = Mock(side_effect=[TTransportException(), TTransportException(), "ok"])
+        self.assertEquals("ok", policy.call(fn, reconnect))
+        self.assertEquals([0.1, 0.2], self.slept)
+        self.assertEquals(2, reconnect.call_count)
+
+        fn = Mock(side_effect=TTransportException("down"))
+        with self.assertRaises(TTransportException):
+            policy.call(fn, reconnect)
+        self.assertEquals(3, fn.call_count)
+
+    def test_reconnect_failures_count_as_attempts(self):
+        policy = RetryPolicy(max_attempts=3, jitter=0, sleep=self.slept.append)
+        reconnect = Mock(side_effect=TTransportException("refused"))
+        with self.assertRaises(TTransportException):
+            policy.call(Mock(side_effect=TTransportException("down")), reconnect)
+        self.assertEquals(2, reconnect.call_count)
+
+    def test_retried_method(self):
+        conn = self._get_mock_connection()
+        conn.client.listTables = Mock(side_effect=[TTransportException(), ["t1"]])
+        self.assertEquals(["t1"], conn.list_tables())
+        conn.reconnect.assert_called_once_with()
+
+    def test_scan_resumes_after_last_cell(self):
+        conn = self._get_mock_connection()
+        conn.client.createScanner = Mock(side_effect=["scanner1", "scanner2"])
+        results = AccumuloTest._get_scan_results.im_func(None)
+        conn.client.nextK = Mock(side_effect=[results[0], TTransportException(), results[1]])
+
+        cells = list(conn.scan("mytable", scanrange=Range(srow="r00", erow="r09"), batchsize=2))
+        self.assertEquals(["r01", "r02", "r03"], [c.row for c in cells])
+        conn.reconnect.assert_called_once_with()
+        rng = conn.client.createScanner.call_args[0][2].range
+        self.assertEquals(Key(row="r02", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=1), rng.start)
+        self.assertTrue(rng.startInclusive)
+        self.assertEquals(Range(erow="r09").to_range().stop, rng.stop)
+
+    def test_resume_range(self):
+        key = Key(row="r05", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=7)
+        self.assertEquals(Key(row="r05", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=6), pyaccumulo._resume_range(None, key).start)
+        self.assertEquals(7, key.timestamp)
+        self.assertIsNone(pyaccumulo._resume_range(Range(erow="r05", einclude=False).to_range(), key))
+        self.assertIsNotNone(pyaccumulo._resume_range(Range(erow="r05").to_range(), key))
+
+    def test_batch_writer_resends_unflushed(self):
+        conn = self._get_mock_connection()
+        conn.client.createWriter = Mock(side_effect=["writer1", "writer2"])
+        b = conn.create_batch_writer("mytable")
+        m1 = Mutation("r01")
+        m1.put(cf="cf", val="1")
+        m2 = Mutation("r02")
+        m2.put(cf="cf", val="2")
+        b.add_mutation(m1)
+        conn.client.update = Mock(side_effect=[TTransportException(), None, None])
+        b.add_mutation(m2)
+        self.assertEquals([call("writer1", {"r02": m2.updates}), call("writer2", {"r01": m1.updates}), call("writer2", {"r02": m2.updates})],
+                          conn.client.update.call_args_list)
+        conn.client.update = Mock()
+        conn.client.flush = Mock(side_effect=[TTransportException(), None])
+        conn.client.createWriter = Mock(return_value="writer3")
+        b.flush()
+        self.assertEquals([call("writer3", {"r01": m1.updates}), call("writer3", {"r02": m2.updates})], conn.client.update.call_args_list)
+        conn.client.flush.assert_called_with("writer3")
+        self.assertEquals([], b._unflushed)
+
+    def test_batch_writer_bounds_unflushed(self):
+        conn = self._get_mock_connection()
+        conn.client.createWriter = Mock(return_value="writer1")
+        b = conn.create_batch_writer("mytable", max_unflushed_bytes=100)
+        m = Mutation("r01")
+        m.put(cf="cf", cq="cq", val="v" * 15)
+        # 3 + 2 + 2 + 15 + 8 = 30 bytes per mutation, the 4th reaches 100
+        for i in range(10):
+            b.add_mutation(m)
+            self.assertTrue(len(b._unflushed) < 4)
+            self.assertTrue(b._unflushed_bytes < 100)
+        self.assertEquals(2, conn.client.flush.call_count)
+        self.assertEquals(2, len(b._unflushed))
+
+        b = conn.create_batch_writer("mytable", max_memory=1000, buffer_mutations=2)
+        self.assertEquals(4000, b.max_unflushed_bytes)
+        b.add_mutations([m] * 300)
+        self.assertTrue(b._unflushed_bytes < 4000)
+        self.assertEquals(4, conn.client.flush.call_count)
+
+class ScanCheckpointTest(unittest.TestCase):
+    def _get_mock_connection(self):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createScanner = Mock(side_effect=["scanner1", "scanner2"])
+        conn.login = "Login"
+        return conn
+
+    def test_checkpoint(self):
+        conn = self._get_mock_connection()
+        results = AccumuloTest._get_scan_results.im_func(None)
+        conn.client.nextK = Mock(side_effect=results)
+
+        scan = conn.scan("mytable", scanrange=Range(srow="r00", erow="r09"), cols=[["cf"]], batchsize=2)
+        self.assertIsNone(scan.checkpoint().last_key)
+        self.assertEquals("r01", scan.next().row)
+        token = scan.checkpoint().to_token()
+        scan.close()
+
+        conn = self._get_mock_connection()
+        conn.client.nextK = Mock(side_effect=results[1:])
+        resumed = conn.scan(resume_from=token, batchsize=2)
+        self.assertEquals(["r03"], [c.row for c in resumed])
+        table, options = conn.client.createScanner.call_args[0][1:]
+        self.assertEquals("mytable", table)
+        self.assertEquals([ScanColumn(colFamily="cf")], options.columns)
+        self.assertEquals(Key(row="r01", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=0), options.range.start)
+        self.assertEquals(Range(erow="r09").to_range().stop, options.range.stop)
+        self.assertEquals(Key(row="r03", colFamily="cf", colQualifier="cq", colVisibility="", timestamp=3), resumed.checkpoint().last_key)
+
+    def test_token_round_trip(self):
+        options = ScanOptions(set(["A"]), Range(srow="a").to_range(), None, [IteratorSetting(10, "it", "some.Class", {"k": "v"})], 100)
+        checkpoint = ScanCheckpoint("mytable", options, Key(row="r01", timestamp=5))
+        self.assertEquals(checkpoint, ScanCheckpoint.from_token(checkpoint.to_token()))
+        checkpoint = ScanCheckpoint("mytable", options, None)
+        self.assertEquals(checkpoint, ScanCheckpoint.from_token(checkpoint.to_token()))
+
+    def test_resume_wrong_table(self):
+        checkpoint = ScanCheckpoint("mytable", ScanOptions(), None)
+        with self.assertRaises(Exception):
+            self._get_mock_connection().scan("othertable", resume_from=checkpoint)
+
+class CellClientTest(unittest.TestCase):
+    def _reply(self, protocol_class, result, mtype=TMessageType.REPLY):
+        buf = TTransport.TMemoryBuffer()
+        oprot = protocol_class(buf)
+        oprot.writeMessageBegin("nextK", mtype, 0)
+        result.write(oprot)
+        oprot.writeMessageEnd()
+        return CellClient(protocol_class(TTransport.TMemoryBuffer(buf.getvalue())))
+
+    def _scan_result(self):
+        return ScanResult(results=[KeyValue(Key(row="r01", colFamily="cf", colQualifier="cq", colVisibility="A&B", timestamp=1400000000000), "v1"),
+                                   KeyValue(Key(row="r02", colFamily="", colQualifier="", colVisibility="", timestamp=-1), "\x00\xff")], more=True)
+
+    def test_recv_nextK_cells(self):
+        for protocol_class in [TCompactProtocol.TCompactProtocol, TBinaryProtocol.TBinaryProtocol]:
+            client = self._reply(protocol_class, AccumuloProxy.nextK_result(success=self._scan_result()))
+            cells, more = client.recv_nextK_cells()
+            self.assertEquals([Cell("r01", "cf", "cq", "A&B", 1400000000000, "v1"), Cell("r02", "", "", "", -1, "\x00\xff")], cells)
+            self.assertTrue(more)
+
+    def test_recv_nextK_cells_matches_generated(self):
+        results = [KeyValue(Key(row="r%03d" % i, colFamily="f" * i, colQualifier=None if i % 3 else "q", colVisibility=None, timestamp=None if i % 5 else -i * 100000000000), "v" * (i * 7))
+                   for i in range(40)]
+        results.append(KeyValue(Key(row="last"), None))
+        for protocol_class in [TCompactProtocol.TCompactProtocol, TBinaryProtocol.TBinaryProtocol]:
+            client = self._reply(protocol_class, AccumuloProxy.nextK_result(success=ScanResult(results=results, more=False)))
+            cells, more = client.recv_nextK_cells()
+            self.assertEquals(pyaccumulo._to_cells(results), cells)
+            self.assertFalse(more)
+
+    def test_recv_nextK_columnar(self):
+        results = [KeyValue(Key(row="r%03d" % i, colFamily="f" * i, colQualifier=None if i % 3 else "q", colVisibility=None, timestamp=i * 100000000000 - 1), "v" * (i * 7))
+                   for i in range(40)]
+        expected = pyaccumulo._to_column_batch(pyaccumulo._to_cells(results))
+        for protocol_class in [TCompactProtocol.TCompactProtocol, TBinaryProtocol.TBinaryProtocol]:
+            client = self._reply(protocol_class, AccumuloProxy.nextK_result(success=ScanResult(results=results, more=True)))
+            batch, more = client.recv_nextK_cells(columnar=True)
+            self.assertIsInstance(batch, ColumnBatch)
+            for column, expected_column in zip(batch, expected):
+                self.assertEquals(list(expected_column), list(column))
+            self.assertEquals(expected.timestamps.__class__, batch.timestamps.__class__)
+            self.assertTrue(more)
+
+        # a reply the fast path does not handle falls back to decoding Cells and transposing them
+        client = self._reply(TCompactProtocol.TCompactProtocol, AccumuloProxy.nextK_result(ouch2=UnknownScanner("gone")))
+        with self.assertRaises(UnknownScanner):
+            client.recv_nextK_cells(columnar=True)
+
+    def test_recv_nextK_cells_empty(self):
+        client = self._reply(TCompactProtocol.TCompactProtocol, AccumuloProxy.nextK_result(success=ScanResult(results=[], more=False)))
+        self.assertEquals(([], False), client.recv_nextK_cells())
+
+    def test_recv_nextK_cells_errors(self):
+        client = self._reply(TCompactProtocol.TCompactProtocol, AccumuloProxy.nextK_result(ouch2=UnknownScanner("gone")))
+        with self.assertRaises(UnknownScanner):
+            client.recv_nextK_cells()
+
+        client = self._reply(TCompactProtocol.TCompactProtocol, TApplicationException(TApplicationException.INTERNAL_ERROR, "boom"), TMessageType.EXCEPTION)
+        with self.assertRaises(TApplicationException):
+            client.recv_nextK_cells()
+
+    def test_client_selection(self):
+        self.assertIsInstance(Accumulo(_connect=False).client, CellClient)
+
+        fb = pyaccumulo.fastbinary
+        try:
+            pyaccumulo.fastbinary = object()
+            self.assertNotIsInstance(Accumulo(_connect=False, protocol="accelerated").client, CellClient)
+            pyaccumulo.fastbinary = None
+            self.assertIsInstance(Accumulo(_connect=False, protocol="accelerated").client, CellClient)
+        finally:
+            pyaccumulo.fastbinary = fb
+
+class ProxyClientTest(unittest.TestCase):
+    def _sent_update_args(self, protocol_class, client_class, cells):
+        buf = TTransport.TMemoryBuffer()
+        client_class(protocol_class(buf)).send_update("writer1", cells)
+        iprot = protocol_class(TTransport.TMemoryBuffer(buf.getvalue()))
+        self.assertEquals(("update", TMessageType.CALL, 0), iprot.readMessageBegin())
+        args = AccumuloProxy.update_args()
+        args.read(iprot)
+        return buf.getvalue(), args
+
+    def _updates(self):
+        m = Mutation("r1")
+        m.put(cf="cf", cq="cq", val="v")
+        m.put(cf="f" * 200, cq="", cv="A&B", ts=1400000000000, val="x" * 300)
+        m.put(cf="cf", cq="old", ts=-5, is_delete=True)
+        m.put(cf="cf", cq="flag", val=None, is_delete=False)
+        return m.updates
+
+    def test_send_update(self):
+        cells = {"r1": self._updates(), "r2": self._updates() * 5, "r" * 300: []}
+        for protocol_class in [TCompactProtocol.TCompactProtocol, TBinaryProtocol.TBinaryProtocol, TBinaryProtocol.TBinaryProtocolAccelerated]:
+            data, args = self._sent_update_args(protocol_class, ProxyClient, cells)
+            self.assertEquals(AccumuloProxy.update_args("writer1", cells), args)
+            self.assertEquals(self._sent_update_args(protocol_class, AccumuloProxy.Client, cells)[0], data)
+
+            data, args = self._sent_update_args(protocol_class, ProxyClient, {})
+            self.assertEquals(AccumuloProxy.update_args("writer1", {}), args)
+
+    def test_send_update_compact_mutations(self):
+        m = CompactMutation("r1")
+        m.put(cf="cf", cq="cq", val="v")
+        m.put(cf="f" * 200, cq="", cv="A&B", ts=1400000000000, val="x" * 300)
+        m.put(cf="cf", cq="old", ts=-5, is_delete=True)
+        m.put(cf="cf", cq="flag", val=None, is_delete=False)
+        self.assertEquals(self._updates(), m.updates)
+        self.assertEquals(4, len(m))
+
+        extra = ColumnUpdate(colFamily="a", colQualifier="b", value="c")
+        for protocol_class in [TCompactProtocol.TCompactProtocol, TBinaryProtocol.TBinaryProtocol, TBinaryProtocol.TBinaryProtocolAccelerated]:
+            data, args = self._sent_update_args(protocol_class, ProxyClient, {"r1": [m, extra, m]})
+            self.assertEquals(AccumuloProxy.update_args("writer1", {"r1": self._updates() + [extra] + self._updates()}), args)
+
+    def test_recv_splitRangeByTablets(self):
+        ranges = [Range(srow="a", erow="m").to_range(), Range(srow="m", erow="z").to_range()]
+        for protocol_class in [TCompactProtocol.TCompactProtocol, TBinaryProtocol.TBinaryProtocol, TBinaryProtocol.TBinaryProtocolAccelerated]:
+            buf = TTransport.TMemoryBuffer()
+            oprot = protocol_class(buf)
+            oprot.writeMessageBegin("splitRangeByTablets", TMessageType.REPLY, 0)
+            AccumuloProxy.splitRangeByTablets_result(success=ranges).write(oprot)
+            oprot.writeMessageEnd()
+
+            client = ProxyClient(protocol_class(TTransport.TMemoryBuffer(buf.getvalue())))
+            self.assertEquals(ranges, client.recv_splitRangeByTablets())
+
+    def test_recv_splitRangeByTablets_error(self):
+        buf = TTransport.TMemoryBuffer()
+        oprot = TCompactProtocol.TCompactProtocol(buf)
+        oprot.writeMessageBegin("splitRangeByTablets", TMessageType.REPLY, 0)
+        AccumuloProxy.splitRangeByTablets_result(ouch3=TableNotFoundException("missing")).write(oprot)
+        oprot.writeMessageEnd()
+
+        client = ProxyClient(TCompactProtocol.TCompactProtocol(TTransport.TMemoryBuffer(buf.getvalue())))
+        with self.assertRaises(TableNotFoundException):
+            client.recv_splitRangeByTablets()
+
+class PipelineTest(unittest.TestCase):
+    def _get_client(self):
+        client = Mock(spec=AccumuloProxy.Client)
+        client.recv_tableExists = Mock(side_effect=[True, False, True])
+        return client
+
+    def test_execute(self):
+        client = self._get_client()
+        conn = Accumulo(_connect=False)
+        conn.client = client
+        p = conn.pipeline()
+        p.tableExists("Login", "t1").tableExists("Login", "t2")
+        p.update("writer1", {"r1": []})
+        p.tableExists("Login", "t3")
+        self.assertEquals(4, len(p))
+
+        self.assertEquals([True, False, None, True], p.execute())
+        self.assertEquals(0, len(p))
+        client.send_tableExists.assert_has_calls([call("Login", "t1"), call("Login", "t2"), call("Login", "t3")])
+        client.send_update.assert_called_with("writer1", {"r1": []})
+        self.assertEquals(3, client.recv_tableExists.call_count)
+
+    def test_max_in_flight(self):
+        client = self._get_client()
+        events = []
+        client.send_tableExists.side_effect = lambda *args: events.append("send")
+        client.recv_tableExists.side_effect = lambda: events.append("recv")
+        p = Pipeline(client, max_in_flight=2)
+        for t in ["t1", "t2", "t3"]:
+            p.tableExists("Login", t)
+        p.execute()
+        self.assertEquals(["send", "send", "recv", "send", "recv", "recv"], events)
+
+    def test_errors(self):
+        client = self._get_client()
+        error = TableNotFoundException("missing")
+        client.recv_tableExists.side_effect = [True, error, True]
+        p = Pipeline(client)
+        for t in ["t1", "t2", "t3"]:
+            p.tableExists("Login", t)
+        self.assertEquals([True, error, True], p.execute(raise_on_error=False))
+
+        client.recv_tableExists.side_effect = [True, error, True]
+        for t in ["t1", "t2", "t3"]:
+            p.tableExists("Login", t)
+        with self.assertRaises(TableNotFoundException):
+            p.execute()
+        self.assertEquals(6, client.recv_tableExists.call_count)
+
+    def test_unknown_method(self):
+        with self.assertRaises(AttributeError):
+            Pipeline(self._get_client()).noSuchCall
+
+class GroupRowsTest(unittest.TestCase):
+    def _cells(self, *rows):
+        return [Cell(r, "cf", "cq%d" % i, "", 1, "v") for i, r in enumerate(rows)]
+
+    def test_group_rows(self):
+        cells = self._cells("r1", "r1", "r2", "r3", "r3", "r3")
+        groups = list(group_rows(iter(cells)))
+        self.assertEquals([("r1", cells[0:2]), ("r2", cells[2:3]), ("r3", cells[3:6])], groups)
+        self.assertEquals([], list(group_rows([])))
+
+    def test_max_row_cells(self):
+        cells = self._cells("r1", "r1", "r1", "r1", "r1", "r2")
+        groups = list(group_rows(cells, max_row_cells=2))
+        self.assertEquals([("r1", cells[0:2]), ("r1", cells[2:4]), ("r1", cells[4:5]), ("r2", cells[5:6])], groups)
+
+    def test_truncate(self):
+        cells = self._cells("r1", "r1", "r1", "r2", "r2", "r3")
+        groups = list(group_rows(cells, max_row_cells=2, truncate=True))
+        self.assertEquals([("r1", cells[0:2]), ("r2", cells[3:5]), ("r3", cells[5:6])], groups)
+
+class AdaptiveBatchSizeTest(unittest.TestCase):
+    def _entries(self, n, val="v"*100):
+        return [Cell("r", "f", "q", "", 1, val)] * n
+
+    def test_grows_on_full_fast_batches(self):
+        sizer = AdaptiveBatchSize(initial=10, maximum=50, target_latency_ms=100)
+        sizer.update(10, self._entries(10), 1)
+        self.assertEquals(20, sizer.size)
+        sizer.update(20, self._entries(20), 1)
+        sizer.update(40, self._entries(40), 1)
+        self.assertEquals(50, sizer.size)
+
+    def test_keeps_size_on_partial_batches(self):
+        sizer = AdaptiveBatchSize(initial=10, target_latency_ms=100)
+        sizer.update(10, self._entries(3), 1)
+        self.assertEquals(10, sizer.size)
+
+    def test_shrinks_on_slow_batches(self):
+        sizer = AdaptiveBatchSize(initial=10, minimum=4, target_latency_ms=100)
+        sizer.update(10, self._entries(10), 500)
+        self.assertEquals(5, sizer.size)
+        sizer.update(5, self._entries(5), 500)
+        self.assertEquals(4, sizer.size)
+
+    def test_byte_budget(self):
+        sizer = AdaptiveBatchSize(initial=10, max_bytes=1120, target_latency_ms=100)
+        sizer.update(10, self._entries(10), 1)
+        self.assertEquals(10, sizer.size)
+
 class RangeTest(unittest.TestCase):
     def test_to_range(self):
 
@@ -460,6 +970,400 @@ class BatchWriterTest(unittest.TestCase):
     def test_flush(self):
         pass
 
+    def _get_writer(self, **kwargs):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(return_value="writer1")
+        conn.login = "Login"
+        return conn, BatchWriter(conn=conn, table="mytable", **kwargs)
+
+    def test_buffer_mutations(self):
+        conn, b = self._get_writer(buffer_mutations=3)
+        m1 = Mutation("r01")
+        m1.put(cf="cf1", val="1")
+        m2 = Mutation("r02")
+        m2.put(cf="cf1", val="2")
+        m3 = Mutation("r01")
+        m3.put(cf="cf2", val="3")
+
+        b.add_mutation(m1)
+        b.add_mutations([m2])
+        self.assertFalse(conn.client.update.called)
+        b.add_mutation(m3)
+        conn.client.update.assert_called_once_with("writer1", {"r01": m1.updates + m3.updates, "r02": m2.updates})
+
+        b.add_mutation(m1)
+        b.flush()
+        conn.client.update.assert_called_with("writer1", {"r01": m1.updates})
+        conn.client.flush.assert_called_with("writer1")
+        self.assertEquals(2, conn.client.update.call_count)
+
+    def test_buffer_size(self):
+        conn, b = self._get_writer(buffer_size=100)
+        m = Mutation("r01")
+        m.put(cf="cf", cq="cq", val="v" * 40)
+        b.add_mutations([m])
+        self.assertFalse(conn.client.update.called)
+        b.add_mutations([m, m])
+        self.assertEquals(1, conn.client.update.call_count)
+        conn.client.update.assert_called_with("writer1", {"r01": m.updates * 2})
+
+        b.close()
+        self.assertEquals(2, conn.client.update.call_count)
+        conn.client.update.assert_called_with("writer1", {"r01": m.updates})
+        conn.client.closeWriter.assert_called_with("writer1")
+
+    def test_coalesce(self):
+        conn, b = self._get_writer(buffer_mutations=10, coalesce=True)
+        m1 = Mutation("r01")
+        m1.put(cf="cf", cq="count", val="1")
+        m1.put(cf="cf", cq="old", val="x")
+        m2 = Mutation("r01")
+        m2.put(cf="cf", cq="count", val="2")
+        m2.put(cf="cf", cq="old", is_delete=True)
+        m3 = CompactMutation("r01")
+        m3.put(cf="cf", cq="count", val="3")
+        m3.put(cf="cf", cq="count", cv="A", val="4")
+        b.add_mutations([m1, m2, m3])
+        b.flush()
+        updates = conn.client.update.call_args[0][1]["r01"]
+        self.assertEquals([m2.updates[1]], updates[:1])
+        self.assertEquals(m3.updates, updates[1].updates)
+
+    def test_coalesce_timestamps(self):
+        put = lambda ts, is_delete=None: ColumnUpdate(colFamily="cf", colQualifier="cq", timestamp=ts, value="v", deleteCell=is_delete)
+        self.assertEquals([put(5)], pyaccumulo._coalesce_updates([put(5), put(5)]))
+        self.assertEquals([put(5), put(6)], pyaccumulo._coalesce_updates([put(5), put(6)]))
+        self.assertEquals([put(5, True)], pyaccumulo._coalesce_updates([put(5), put(5, True)]))
+        self.assertEquals([put(5, True), put(5)], pyaccumulo._coalesce_updates([put(5, True), put(5)]))
+
+    def test_close_without_buffered_mutations(self):
+        conn, b = self._get_writer(buffer_size=100)
+        b.close()
+        self.assertFalse(conn.client.update.called)
+
+class CompactMutationBatchWriterTest(unittest.TestCase):
+    def test_add_mutations(self):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(return_value="writer1")
+        conn.login = "Login"
+        b = conn.create_batch_writer("mytable")
+
+        m1 = CompactMutation("r01")
+        m1.put(cf="cf", cq="cq", val="v")
+        m2 = Mutation("r01")
+        m2.put(cf="cf", cq="cq2", val="v")
+        b.add_mutation(m1)
+        conn.client.update.assert_called_with("writer1", {"r01": [m1]})
+        b.add_mutations([m1, m2])
+        conn.client.update.assert_called_with("writer1", {"r01": [m1] + m2.updates})
+
+    def test_mutation_size(self):
+        m1 = CompactMutation("r01")
+        m1.put(cf="cf", cq="cq", val="v", cv="A")
+        m2 = Mutation("r01")
+        m2.put(cf="cf", cq="cq", val="v", cv="A")
+        self.assertEquals(pyaccumulo._mutation_size(m2), pyaccumulo._mutation_size(m1))
+
+class WriteColumnsTest(unittest.TestCase):
+    def _get_writer(self):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(return_value="writer1")
+        conn.login = "Login"
+        return conn, conn.create_batch_writer("mytable")
+
+    def _cells(self, conn):
+        cells = []
+        for (writer, updates), _ in conn.client.update.call_args_list:
+            for row, muts in sorted(updates.items()):
+                for m in muts:
+                    cells.extend((row, u.colFamily, u.colQualifier, u.colVisibility, u.timestamp, u.value) for u in m.updates)
+        return cells
+
+    def test_write_columns(self):
+        conn, b = self._get_writer()
+        b.write_columns(["r01", "r02"], [("cf", "a", [1, None]), ("cf", "b", ["x", "y"])], cvs="A", tss=[5, 6])
+        self.assertEquals([("r01", "cf", "a", "A", 5, "1"), ("r01", "cf", "b", "A", 5, "x"),
+                           ("r02", "cf", "b", "A", 6, "y")], self._cells(conn))
+
+    def test_write_columns_lengths(self):
+        conn, b = self._get_writer()
+        with self.assertRaises(Exception):
+            b.write_columns(["r1", "r2", "r3"], [("f", "a", [1, 2, 3]), ("f", "b", [1])])
+        with self.assertRaises(Exception):
+            b.write_columns(["r1", "r2"], [("f", "a", [1, 2])], tss=[1])
+        with self.assertRaises(Exception):
+            b.write_columns(["r1", "r2"], [("f", "a", [1, 2])], cvs=["A", "B", "C"])
+        self.assertFalse(conn.client.update.called)
+
+    def test_write_columns_chunks(self):
+        conn, b = self._get_writer()
+        b.write_columns(range(5), {("cf", "cq"): range(5)}, chunk_rows=2)
+        self.assertEquals(3, conn.client.update.call_count)
+        self.assertEquals([(str(i), "cf", "cq", None, None, str(i)) for i in range(5)], self._cells(conn))
+
+    def test_write_columns_numpy(self):
+        if pyaccumulo.numpy is None:
+            self.skipTest("numpy is not installed")
+        np = pyaccumulo.numpy
+        conn, b = self._get_writer()
+        b.write_columns(np.array(["r01", "r02"]), [("cf", "f", np.array([1.5, np.nan]))], tss=np.array([1, 2]))
+        self.assertEquals([("r01", "cf", "f", None, 1, "1.5")], self._cells(conn))
+
+    def test_write_frame(self):
+        class Frame(object):
+            index = ["r01", "r02"]
+            columns = ["id", "a", ("meta", "b")]
+            data = {"id": ["i1", "i2"], "a": [1, 2], ("meta", "b"): ["x", None]}
+            def __getitem__(self, label):
+                return self.data[label]
+
+        conn, _ = self._get_writer()
+        conn.write_frame("mytable", Frame(), cf="cf")
+        self.assertEquals([("r01", "cf", "id", None, None, "i1"), ("r01", "cf", "a", None, None, "1"),
+                           ("r01", "meta", "b", None, None, "x"), ("r02", "cf", "id", None, None, "i2"),
+                           ("r02", "cf", "a", None, None, "2")], self._cells(conn))
+        conn.client.closeWriter.assert_called_with("writer1")
+
+        conn.client.update.reset_mock()
+        conn.write_frame("mytable", Frame(), cf="cf", row_column="id")
+        self.assertEquals(["i1", "i1", "i2"], [c[0] for c in self._cells(conn)])
+
+class TokenBucketTest(unittest.TestCase):
+    def test_acquire(self):
+        now = [100.0]
+        slept = []
+        def sleep(secs):
+            slept.append(secs)
+            now[0] += secs
+        bucket = TokenBucket(100, clock=lambda: now[0], sleep=sleep)
+        self.assertEquals(0, bucket.acquire(60))
+        self.assertEquals(0, bucket.acquire(40))
+        self.assertAlmostEquals(0.5, bucket.acquire(50))
+        now[0] += 1.0
+        self.assertEquals(0, bucket.acquire(100))
+        self.assertAlmostEquals(2.0, bucket.acquire(200))
+        self.assertEquals(2, len(slept))
+
+class LatencyBackpressureTest(unittest.TestCase):
+    def test_delay(self):
+        slept = []
+        bp = LatencyBackpressure(100, min_delay_ms=10, max_delay_ms=35, sleep=slept.append)
+        bp.wait()
+        bp.record(50)
+        self.assertEquals(0, bp.delay_ms)
+        for expected in (10, 20, 35, 35):
+            bp.record(150)
+            self.assertEquals(expected, bp.delay_ms)
+        bp.wait()
+        self.assertEquals([0.035], slept)
+        bp.record(50)
+        self.assertEquals(17, bp.delay_ms)
+        bp.record(50)
+        self.assertEquals(0, bp.delay_ms)
+
+    def test_batch_writer(self):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(return_value="writer1")
+        conn.login = "Login"
+        b = conn.create_batch_writer("mytable", buffer_mutations=2, max_bytes_per_sec=1000, max_mutations_per_sec=10, target_latency_ms=100)
+        b.byte_limiter = Mock()
+        b.mutation_limiter = Mock()
+        b.backpressure.record = Mock()
+        m = Mutation("r01")
+        m.put(cf="cf", cq="cq", val="v")
+        b.add_mutations([m, m])
+        b.byte_limiter.acquire.assert_called_once_with(2 * pyaccumulo._mutation_size(m))
+        b.mutation_limiter.acquire.assert_called_once_with(2)
+        b.flush()
+        self.assertEquals(2, b.backpressure.record.call_count)
+
+class WriteAheadSpoolTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _get_writer(self):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(return_value="writer1")
+        conn.login = "Login"
+        return conn, conn.create_batch_writer("mytable", spool=self.path)
+
+    def test_replay(self):
+        m1 = Mutation("r01")
+        m1.put(cf="cf", cq="cq", val="1", ts=5)
+        m2 = CompactMutation("r02")
+        m2.put(cf="cf", cq="cq", cv="A", is_delete=True)
+
+        conn, b = self._get_writer()
+        b.add_mutation(m1)
+        b.flush()
+        self.assertEquals([], b.spool.pending())
+        b.add_mutation(m1)
+        b.add_mutation(m2)
+        self.assertEquals([{"r01": m1.updates}, {"r02": m2.updates}], b.spool.pending())
+
+        conn, b = self._get_writer()
+        self.assertEquals(2, b.replay())
+        self.assertEquals([call("writer1", {"r01": m1.updates}), call("writer1", {"r02": m2.updates})], conn.client.update.call_args_list)
+        conn.client.flush.assert_called_once_with("writer1")
+        self.assertEquals(0, b.replay())
+        b.close()
+        self.assertEquals(0, os.path.getsize(self.path))
+
+    def test_requires_replay(self):
+        m1 = Mutation("r01")
+        m1.put(cf="cf", cq="cq", val="1")
+        conn, b = self._get_writer()
+        b.add_mutation(m1)
+
+        conn, b = self._get_writer()
+        with self.assertRaises(Exception):
+            b.add_mutation(m1)
+        with self.assertRaises(Exception):
+            b.add_mutations([m1])
+        with self.assertRaises(Exception):
+            b.flush()
+        b.close()
+        self.assertFalse(conn.client.update.called)
+        self.assertEquals([{"r01": m1.updates}], WriteAheadSpool(self.path).pending())
+
+        conn, b = self._get_writer()
+        self.assertEquals(1, b.replay())
+        b.add_mutation(m1)
+        b.flush()
+        self.assertEquals([], b.spool.pending())
+
+    def test_torn_record(self):
+        m1 = Mutation("r01")
+        m1.put(cf="cf", cq="cq", val="1")
+        spool = WriteAheadSpool(self.path)
+        spool.append({"r01": m1.updates})
+        spool.append({"r02": m1.updates})
+        spool.close()
+        with open(self.path, "rb+") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEquals([{"r01": m1.updates}], WriteAheadSpool(self.path).pending())
+
+class MultiTableBatchWriterTest(unittest.TestCase):
+    def _get_writer(self, **kwargs):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(side_effect=lambda login, table, opts: "writer_" + table)
+        conn.login = "Login"
+        return conn, conn.create_multi_table_batch_writer(**kwargs)
+
+    def test_shared_buffer(self):
+        conn, b = self._get_writer(buffer_mutations=3)
+        m1 = Mutation("r01")
+        m1.put(cf="cf", val="1")
+        m2 = Mutation("r02")
+        m2.put(cf="cf", val="2")
+        b.add_mutation("docs", m1)
+        b.add_mutations("index", [m2])
+        self.assertEquals([call("Login", "docs", WriterOptions(maxMemory=10*1024, latencyMs=30*1000, timeoutMs=5*1000, threads=10)),
+                           call("Login", "index", WriterOptions(maxMemory=10*1024, latencyMs=30*1000, timeoutMs=5*1000, threads=10))],
+                          conn.client.createWriter.call_args_list)
+        self.assertFalse(conn.client.update.called)
+
+        b.add_mutation("docs", m2)
+        self.assertEquals(sorted([call("writer_docs", {"r01": m1.updates, "r02": m2.updates}), call("writer_index", {"r02": m2.updates})]),
+                          sorted(conn.client.update.call_args_list))
+
+        b.add_mutation("index", m1)
+        b.flush()
+        conn.client.update.assert_called_with("writer_index", {"r01": m1.updates})
+        self.assertEquals(3, conn.client.update.call_count)
+        self.assertEquals(sorted([call("writer_docs"), call("writer_index")]), sorted(conn.client.send_flush.call_args_list))
+        self.assertEquals(2, conn.client.recv_flush.call_count)
+
+    def test_close(self):
+        conn, b = self._get_writer()
+        m1 = Mutation("r01")
+        m1.put(cf="cf", val="1")
+        b.add_mutation("docs", m1)
+        b.close()
+        conn.client.update.assert_called_once_with("writer_docs", {"r01": m1.updates})
+        conn.client.send_closeWriter.assert_called_once_with("writer_docs")
+        with self.assertRaises(Exception):
+            b.add_mutation("docs", m1)
+
+class AsyncBatchWriterTest(unittest.TestCase):
+    def _get_writer(self, **kwargs):
+        conn = Accumulo(_connect=False)
+        conn.client = Mock()
+        conn.client.createWriter = Mock(return_value="writer1")
+        conn.login = "Login"
+        kwargs.setdefault("sender_conn", conn)
+        return conn, conn.create_async_batch_writer("mytable", **kwargs)
+
+    def test_writes_in_background(self):
+        sender = Accumulo(_connect=False)
+        sender.client = Mock()
+        sender.client.createWriter = Mock(return_value="writer1")
+        sender.login = "SenderLogin"
+        conn, b = self._get_writer(sender_conn=sender, buffer_mutations=2)
+        sender.client.createWriter.assert_called_with("SenderLogin", "mytable", WriterOptions(maxMemory=10*1024, latencyMs=30*1000, timeoutMs=5*1000, threads=10))
+        self.assertFalse(conn.client.createWriter.called)
+        self.assertEquals({"scanners": 0, "writers": 1}, sender.open_counts())
+        self.assertEquals({"scanners": 0, "writers": 0}, conn.open_counts())
+        m = Mutation("r01")
+        m.put(cf="cf", val="v")
+        b.add_mutation(m)
+        b.add_mutation(m)
+        b.add_mutation(m)
+        b.flush()
+        self.assertEquals([call("writer1", {"r01": m.updates * 2}), call("writer1", {"r01": m.updates})], sender.client.update.call_args_list)
+        sender.client.flush.assert_called_once_with("writer1")
+        b.close()
+        sender.client.closeWriter.assert_called_once_with("writer1")
+        self.assertFalse(conn.client.update.called)
+        self.assertEquals({"scanners": 0, "writers": 0}, sender.open_counts())
+
+    def test_backpressure(self):
+        conn, b = self._get_writer(queue_size=1)
+        sending = threading.Event()
+        release = threading.Event()
+
+        def update(writer, cells):
+            sending.set()
+            release.wait(5)
+        conn.client.update = Mock(side_effect=update)
+
+        b.add_mutation(Mutation("r01"))
+        sending.wait(5)
+        b.add_mutation(Mutation("r02"))
+        blocked = threading.Thread(target=b.add_mutation, args=(Mutation("r03"),))
+        blocked.start()
+        blocked.join(0.1)
+        self.assertTrue(blocked.is_alive())
+        release.set()
+        blocked.join(5)
+        b.close()
+        self.assertEquals(3, conn.client.update.call_count)
+
+    def test_errors(self):
+        conn, b = self._get_writer()
+        conn.client.update = Mock(side_effect=ValueError("rejected"))
+        b.add_mutation(Mutation("r01"))
+        with self.assertRaises(ValueError):
+            b.flush()
+        with self.assertRaises(ValueError):
+            b.add_mutation(Mutation("r02"))
+        self.assertEquals(1, conn.client.update.call_count)
+        self.assertFalse(conn.client.flush.called)
+        with self.assertRaises(ValueError):
+            b.close()
+        conn.client.closeWriter.assert_called_with("writer1")
+        self.assertTrue(b._is_closed)
+
 #----------------------------------------------
 
 def main():
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from mock import Mock
+
+from pyaccumulo import Accumulo, Mutation, Range, Cell, ScanInfo, TraceHooks, SlowOperationLogger
+from pyaccumulo.local_proxy import LocalProxy
+
+
+class RecordingHooks(TraceHooks):
+    def __init__(self):
+        super(RecordingHooks, self).__init__()
+        self.events = []
+
+    def scanner_created(self, scan, latency_ms):
+        self.events.append(("created", scan.table, scan))
+
+    def scan_batch(self, scan, cells, nbytes, latency_ms):
+        self.events.append(("batch", scan.table, len(cells), nbytes))
+
+    def scanner_closed(self, scan, ncells):
+        self.events.append(("closed", scan.table, ncells))
+
+    def writer_updated(self, writer, cells, nmuts, nbytes, latency_ms):
+        self.events.append(("update", writer.table, nmuts, nbytes))
+
+    def writer_flushed(self, writer, latency_ms):
+        self.events.append(("flush", writer.table))
+
+    def writer_closed(self, writer, latency_ms):
+        self.events.append(("close", writer.table))
+
+
+class HooksTest(unittest.TestCase):
+    def setUp(self):
+        self.proxy = LocalProxy().start()
+        self.addCleanup(self.proxy.stop)
+        self.hooks = RecordingHooks()
+        self.conn = self.proxy.connect(hooks=self.hooks)
+        self.addCleanup(self.conn.close)
+        self.conn.create_table("mytable")
+
+    def _write(self, wr, n):
+        for i in range(n):
+            m = Mutation("r%02d" % i)
+            m.put(cf="cf", cq="cq", val="v")
+            wr.add_mutation(m)
+
+    def test_writer(self):
+        wr = self.conn.create_batch_writer("mytable", buffer_mutations=3)
+        self._write(wr, 4)
+        wr.flush()
+        wr.close()
+        self.assertEquals([("update", "mytable", 3, 3 * 16), ("update", "mytable", 1, 16), ("flush", "mytable"), ("close", "mytable")],
+                          self.hooks.events)
+
+    def test_unbuffered_writer_counts_bytes(self):
+        wr = self.conn.create_batch_writer("mytable")
+        m = Mutation("r01")
+        m.put(cf="cf", cq="cq", val="value")
+        wr.add_mutations([m, m])
+        wr.close()
+        self.assertEquals([("update", "mytable", 2, 2 * 20), ("close", "mytable")], self.hooks.events)
+
+    def test_scan(self):
+        wr = self.conn.create_batch_writer("mytable")
+        self._write(wr, 5)
+        wr.close()
+        del self.hooks.events[:]
+
+        cells = list(self.conn.scan("mytable", scanrange=Range(srow="r01", erow="r03"), batchsize=2))
+        self.assertEquals(3, len(cells))
+        created, batches, closed = self.hooks.events[0], self.hooks.events[1:-1], self.hooks.events[-1]
+        self.assertEquals("mytable", created[1])
+        self.assertEquals("r01", created[2].options.range.start.row)
+        self.assertEquals([("batch", "mytable", 2, 2 * 16), ("batch", "mytable", 1, 16)], batches)
+        self.assertEquals(("closed", "mytable", 3), closed)
+
+    def test_batch_scan(self):
+        wr = self.conn.create_batch_writer("mytable")
+        self._write(wr, 5)
+        wr.close()
+        del self.hooks.events[:]
+
+        self.assertEquals(5, len(list(self.conn.batch_scan("mytable", batchsize=10))))
+        self.assertEquals(["created", "batch", "closed"], [e[0] for e in self.hooks.events])
+        self.assertEquals(5, self.hooks.events[-1][2])
+
+    def test_perform_scan_without_info(self):
+        conn = Accumulo(_connect=False, hooks=RecordingHooks())
+        conn.client = Mock()
+        conn.client.nextK = Mock(return_value=Mock(results=[], more=False))
+        self.assertEquals([], list(conn.perform_scan("scanner1", 10)))
+        self.assertEquals([("batch", None, 0, 0), ("closed", None, 0)], conn.hooks.events)
+
+
+class SlowOperationLoggerTest(unittest.TestCase):
+    def test_logs_slow_operations(self):
+        logger = Mock()
+        hooks = SlowOperationLogger(threshold_ms=100, logger=logger)
+        scan = ScanInfo("mytable", "options", "scanner1")
+        hooks.scan_batch(scan, [Cell("r", "cf", "cq", "", 0, "v")], 10, 50)
+        self.assertFalse(logger.warning.called)
+        hooks.scan_batch(scan, [Cell("r", "cf", "cq", "", 0, "v")], 10, 150)
+        self.assertEquals(1, logger.warning.call_count)
+        self.assertEquals((1, 10, "mytable", "options", 150), logger.warning.call_args[0][1:])
+        hooks.writer_flushed(Mock(table="mytable"), 500)
+        self.assertEquals(2, logger.warning.call_count)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gc
+import unittest
+
+from pyaccumulo import Mutation, CompactMutation, Range, Cell, RetryPolicy
+from pyaccumulo.parallel import ParallelScan
+from pyaccumulo.local_proxy import LocalProxy, MemoryProxyHandler
+from pyaccumulo.pool import AccumuloPool
+from pyaccumulo.proxy.ttypes import AccumuloException, TableExistsException
+
+
+class LocalProxyTest(unittest.TestCase):
+    protocol = "compact"
+
+    def setUp(self):
+        self.proxy = LocalProxy(protocol=self.protocol).start()
+        self.addCleanup(self.proxy.stop)
+        self.conn = self.proxy.connect()
+        self.addCleanup(self.conn.close)
+        self.conn.create_table("mytable")
+
+    def _write_rows(self, n):
+        wr = self.conn.create_batch_writer("mytable")
+        for i in range(n):
+            m = Mutation("r%02d" % i)
+            m.put(cf="cf1", cq="cq", val="a%d" % i, ts=10)
+            m.put(cf="cf2", cq="cq", val="b%d" % i, ts=10)
+            wr.add_mutation(m)
+        wr.close()
+
+    def test_tables(self):
+        self.assertEquals(["mytable"], self.conn.list_tables())
+        with self.assertRaises(TableExistsException):
+            self.conn.create_table("mytable")
+        self.conn.rename_table("mytable", "other")
+        self.assertFalse(self.conn.table_exists("mytable"))
+        self.conn.delete_table("other")
+        self.assertEquals([], self.conn.list_tables())
+        with self.assertRaises(AccumuloException):
+            self.conn.create_batch_writer("other")
+        self.assertEquals([], self.conn.list_tables())
+
+    def test_write_and_scan(self):
+        self._write_rows(25)
+        cells = list(self.conn.scan("mytable", batchsize=7))
+        self.assertEquals(50, len(cells))
+        self.assertEquals(Cell("r00", "cf1", "cq", "", 10, "a0"), cells[0])
+        self.assertEquals(Cell("r24", "cf2", "cq", "", 10, "b24"), cells[-1])
+
+        cells = list(self.conn.scan("mytable", scanrange=Range(srow="r03", erow="r05"), cols=[["cf2"]]))
+        self.assertEquals(["b3", "b4", "b5"], [c.val for c in cells])
+        cells = list(self.conn.scan("mytable", scanrange=Range(srow="r03", erow="r05", einclude=False), cols=[["cf1", "cq"]]))
+        self.assertEquals(["a3", "a4"], [c.val for c in cells])
+
+        cells = list(self.conn.batch_scan("mytable", scanranges=[Range(srow="r20"), Range(erow="r01")], cols=[["cf1"]]))
+        self.assertEquals(["r00", "r01", "r20", "r21", "r22", "r23", "r24"], sorted(c.row for c in cells))
+
+    def test_versions_and_deletes(self):
+        m = Mutation("r01")
+        m.put(cf="cf", cq="a", val="old", ts=1)
+        m.put(cf="cf", cq="b", val="gone", ts=1)
+        self.conn.add_mutations_and_flush("mytable", m)
+        m = CompactMutation("r01")
+        m.put(cf="cf", cq="a", val="new", ts=2)
+        m.put(cf="cf", cq="b", ts=1, is_delete=True)
+        self.conn.add_mutations_and_flush("mytable", m)
+        self.assertEquals([Cell("r01", "cf", "a", "", 2, "new")], list(self.conn.scan("mytable")))
+
+    def test_resume(self):
+        self._write_rows(10)
+        scan = self.conn.scan("mytable", batchsize=3)
+        first = [scan.next() for _ in range(5)]
+        token = scan.checkpoint().to_token()
+        scan.close()
+        rest = list(self.conn.scan(resume_from=token))
+        self.assertEquals(list(self.conn.scan("mytable")), first + rest)
+
+    def test_splits(self):
+        self.conn.add_splits("mytable", set(["r10", "r20"]))
+        self.assertEquals(["r10", "r20"], sorted(self.conn.client.getSplits(self.conn.login, "mytable", 10)))
+        pieces = self.conn.split_range_by_tablets("mytable")
+        self.assertEquals(3, len(pieces))
+        self.assertEquals(2, len(self.conn.split_range_by_tablets("mytable", Range(srow="r15", erow="r25"))))
+
+        self._write_rows(30)
+        pool = AccumuloPool(max_size=3, host=self.proxy.host, port=self.proxy.port, protocol=self.protocol)
+        self.addCleanup(pool.close)
+        cells = list(ParallelScan(pool, "mytable", batchsize=4))
+        self.assertEquals(list(self.conn.scan("mytable")), cells)
+
+class ScanCleanupTest(unittest.TestCase):
+    def setUp(self):
+        self.proxy = LocalProxy().start()
+        self.addCleanup(self.proxy.stop)
+        self.conn = self.proxy.connect()
+        self.addCleanup(self.conn.close)
+        self.conn.create_table("mytable")
+        wr = self.conn.create_batch_writer("mytable")
+        for i in range(20):
+            m = Mutation("r%02d" % i)
+            m.put(cf="cf", cq="cq", val="v")
+            wr.add_mutation(m)
+        wr.close()
+
+    def assertOpen(self, scanners, writers=0):
+        self.assertEquals({"scanners": scanners, "writers": writers}, self.conn.open_counts())
+        self.assertEquals(scanners, len(self.proxy.handler._scanners))
+
+    def test_exhausted(self):
+        self.assertEquals(20, len(list(self.conn.scan("mytable", batchsize=3))))
+        self.assertEquals(20, len(list(self.conn.batch_scan("mytable", batchsize=3))))
+        self.assertOpen(0)
+
+    def test_created_lazily(self):
+        scan = self.conn.batch_scan("mytable")
+        self.assertOpen(0)
+        del scan
+        self.assertOpen(0)
+
+    def test_closed_early(self):
+        scan = self.conn.scan("mytable", batchsize=3)
+        scan.next()
+        self.assertOpen(1)
+        self.assertEquals("mytable", self.conn.open_scanners()[0].table)
+        scan.close()
+        self.assertOpen(0)
+
+        for cells in self.conn.scan_columnar("mytable", batchsize=3):
+            break
+        self.assertOpen(0)
+
+    def test_context_manager(self):
+        with self.conn.batch_scan("mytable", batchsize=3) as scan:
+            for cell in scan:
+                break
+            self.assertOpen(1)
+        self.assertOpen(0)
+
+        with self.assertRaises(ValueError):
+            with self.conn.scan("mytable", batchsize=3, prefetch=2) as scan:
+                scan.next()
+                raise ValueError()
+        self.assertOpen(0)
+
+    def test_garbage_collected(self):
+        scan = self.conn.scan("mytable", batchsize=3)
+        scan.next()
+        checkpoint = scan.checkpoint()
+        del scan
+        gc.collect()
+        self.assertOpen(0)
+        self.assertEquals(19, len(list(self.conn.scan(resume_from=checkpoint))))
+
+        cells = self.conn.perform_scan(self.conn.client.createScanner(self.conn.login, "mytable", None), 3)
+        cells.next()
+        self.assertOpen(1)
+        del cells
+        self.assertOpen(0)
+
+    def test_error(self):
+        scan = self.conn.scan("mytable", batchsize=3)
+        scan.next()
+        self.proxy.handler.deleteTable(self.conn.login, "mytable")
+        self.proxy.handler._scanners.clear()
+        with self.assertRaises(Exception):
+            list(scan)
+        self.assertEquals({"scanners": 0, "writers": 0}, self.conn.open_counts())
+
+    def test_writers(self):
+        self.conn.create_table("other")
+        wr = self.conn.create_batch_writer("mytable")
+        multi = self.conn.create_multi_table_batch_writer()
+        multi.add_mutation("other", Mutation("r01"))
+        self.assertEquals(sorted([("mytable", wr._writer), ("other", multi._writers["other"])]), sorted(self.conn.open_writers()))
+        self.assertOpen(0, 2)
+        wr.close()
+        multi.close()
+        self.assertOpen(0, 0)
+
+    def test_async_writer_sender_connection(self):
+        wr = self.conn.create_async_batch_writer("mytable", buffer_mutations=2)
+        sender = wr._sender_conn
+        self.assertIsNot(self.conn, sender)
+        self.assertEquals({"scanners": 0, "writers": 1}, sender.open_counts())
+        self.assertOpen(0, 0)
+        for i in range(20, 25):
+            m = Mutation("r%02d" % i)
+            m.put(cf="cf", cq="cq", val="v")
+            wr.add_mutation(m)
+        wr.close()
+        self.assertFalse(sender.transport.isOpen())
+        self.assertTrue(self.conn.transport.isOpen())
+        self.assertEquals(25, len(list(self.conn.scan("mytable"))))
+
+        wr = self.conn.create_async_batch_writer("mytable", sender_conn=self.conn)
+        self.assertOpen(0, 1)
+        wr.close()
+        self.assertOpen(0, 0)
+        self.assertTrue(self.conn.transport.isOpen())
+
+class ProxyRestartTest(unittest.TestCase):
+    def setUp(self):
+        self.proxy = LocalProxy().start()
+        self.addCleanup(lambda: self.proxy.stop())
+        self.conn = self.proxy.connect(retry=RetryPolicy(max_attempts=5, initial_delay=0.01, sleep=lambda secs: None))
+        self.addCleanup(self.conn.close)
+        self.conn.create_table("mytable")
+
+    def _restart(self):
+        # the tables live in Accumulo and survive, the proxy's writers and scanners do not
+        old = self.proxy.handler
+        self.proxy.stop()
+        handler = MemoryProxyHandler()
+        handler._tables = old._tables
+        handler._ids = old._ids
+        self.proxy = LocalProxy(port=self.proxy.port, handler=handler).start()
+        # another call on the connection reconnects before the writer or scan notices
+        self.assertTrue(self.conn.table_exists("mytable"))
+
+    def _mutation(self, row):
+        m = Mutation(row)
+        m.put(cf="cf", cq="cq", val="v", ts=1)
+        return m
+
+    def test_writer(self):
+        wr = self.conn.create_batch_writer("mytable")
+        wr.add_mutation(self._mutation("r01"))
+        self._restart()
+        wr.add_mutation(self._mutation("r02"))
+        wr.flush()
+        wr.add_mutation(self._mutation("r03"))
+        wr.close()
+        self.assertEquals(["r01", "r02", "r03"], [c.row for c in self.conn.scan("mytable")])
+        self.assertEquals({"scanners": 0, "writers": 0}, self.conn.open_counts())
+
+    def test_scan(self):
+        wr = self.conn.create_batch_writer("mytable")
+        wr.add_mutations([self._mutation("r%02d" % i) for i in range(10)])
+        wr.close()
+        scan = self.conn.scan("mytable", batchsize=3)
+        first = [scan.next() for _ in range(4)]
+        self._restart()
+        rest = list(scan)
+        self.assertEquals(["r%02d" % i for i in range(10)], [c.row for c in first + rest])
+        self.assertEquals({"scanners": 0, "writers": 0}, self.conn.open_counts())
+        self.assertEquals({}, self.proxy.handler._scanners)
+
+class LocalProxyBinaryTest(LocalProxyTest):
+    protocol = "binary"
+
+class LocalProxyAcceleratedTest(LocalProxyTest):
+    protocol = "accelerated"
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import unittest
+
+from mock import Mock
+from thrift.transport import TTransport
+
+from pyaccumulo import Accumulo, Mutation, CellClient, RpcMetrics, LogExporter
+from pyaccumulo.local_proxy import LocalProxy
+from pyaccumulo.metrics import CountingFramedTransport, instrumented_client_class
+from pyaccumulo.proxy.ttypes import TableExistsException
+
+
+class RpcMetricsTest(unittest.TestCase):
+    def test_record_and_snapshot(self):
+        metrics = RpcMetrics()
+        metrics.record("nextK", 0.5, 10, 100)
+        metrics.record("nextK", 30, 10, 200)
+        metrics.record("nextK", 20000, 10, 0, error=True)
+        stats = metrics.snapshot()["nextK"]
+        self.assertEquals(3, stats["calls"])
+        self.assertEquals(1, stats["errors"])
+        self.assertEquals(30, stats["bytes_out"])
+        self.assertEquals(300, stats["bytes_in"])
+        latency = stats["latency_ms"]
+        self.assertEquals(20000, latency["max"])
+        self.assertAlmostEquals(20030.5 / 3, latency["mean"])
+        self.assertEquals(50, latency["p50"])
+        self.assertEquals(20000, latency["p99"])
+        histogram = dict(latency["histogram"])
+        self.assertEquals(1, histogram[1])
+        self.assertEquals(1, histogram[50])
+        self.assertEquals(1, histogram[None])
+        self.assertEquals(3, sum(histogram.values()))
+
+    def test_snapshot_is_a_copy(self):
+        metrics = RpcMetrics()
+        metrics.record("login", 1)
+        snapshot = metrics.snapshot()
+        metrics.record("login", 1)
+        self.assertEquals(1, snapshot["login"]["calls"])
+        metrics.reset()
+        self.assertEquals({}, metrics.snapshot())
+
+    def test_export(self):
+        exporter = Mock()
+        metrics = RpcMetrics(exporters=[exporter])
+        metrics.record("flush", 3)
+        snapshot = metrics.export(reset=True)
+        exporter.assert_called_once_with(snapshot)
+        self.assertEquals(1, snapshot["flush"]["calls"])
+        self.assertEquals({}, metrics.snapshot())
+
+    def test_log_exporter(self):
+        logger = Mock()
+        metrics = RpcMetrics(exporters=[LogExporter(logger, logging.DEBUG)])
+        metrics.record("login", 1)
+        metrics.record("nextK", 1)
+        metrics.export()
+        self.assertEquals(2, logger.log.call_count)
+        self.assertEquals(logging.DEBUG, logger.log.call_args[0][0])
+        self.assertEquals("nextK", logger.log.call_args[0][2])
+
+
+class CountingFramedTransportTest(unittest.TestCase):
+    def test_counts_frames(self):
+        out = TTransport.TMemoryBuffer()
+        trans = CountingFramedTransport(out)
+        trans.write("abc")
+        trans.write("de")
+        trans.flush()
+        self.assertEquals(9, trans.bytes_written)
+        self.assertEquals(9, len(out.getvalue()))
+
+        trans = CountingFramedTransport(TTransport.TMemoryBuffer(out.getvalue()))
+        self.assertEquals("abcde", trans.read(5))
+        self.assertEquals(9, trans.bytes_read)
+
+    def test_instrumented_client(self):
+        cls = instrumented_client_class(CellClient)
+        self.assertTrue(issubclass(cls, CellClient))
+        self.assertIs(cls, instrumented_client_class(CellClient))
+
+    def test_disabled_by_default(self):
+        conn = Accumulo(_connect=False)
+        self.assertIs(CellClient, conn.client.__class__)
+        self.assertIs(TTransport.TFramedTransport, conn.transport.__class__)
+
+
+class MetricsLocalProxyTest(unittest.TestCase):
+    def setUp(self):
+        self.proxy = LocalProxy().start()
+        self.addCleanup(self.proxy.stop)
+        self.metrics = RpcMetrics()
+        self.conn = self.proxy.connect(metrics=self.metrics)
+        self.addCleanup(self.conn.close)
+
+    def test_records_calls(self):
+        self.conn.create_table("mytable")
+        with self.assertRaises(TableExistsException):
+            self.conn.create_table("mytable")
+        wr = self.conn.create_batch_writer("mytable")
+        for i in range(20):
+            m = Mutation("r%02d" % i)
+            m.put(cf="cf", cq="cq", val="v" * 100)
+            wr.add_mutation(m)
+        wr.close()
+        self.assertEquals(20, len(list(self.conn.scan("mytable", batchsize=5))))
+
+        snapshot = self.metrics.snapshot()
+        self.assertEquals(1, snapshot["login"]["calls"])
+        self.assertEquals(2, snapshot["createTable"]["calls"])
+        self.assertEquals(1, snapshot["createTable"]["errors"])
+        self.assertEquals(1, snapshot["closeWriter"]["calls"])
+        self.assertTrue(snapshot["update"]["bytes_out"] > 2000)
+        self.assertEquals(0, snapshot["update"]["bytes_in"])
+        self.assertEquals(1, snapshot["createScanner"]["calls"])
+        self.assertTrue(snapshot["nextK"]["calls"] >= 4)
+        self.assertTrue(snapshot["nextK"]["bytes_in"] > 2000)
+        for stats in snapshot.itervalues():
+            self.assertEquals(stats["calls"], sum(count for _, count in stats["latency_ms"]["histogram"]))
+            self.assertTrue(stats["bytes_out"] > 0)
+
+        total_out = sum(stats["bytes_out"] for stats in snapshot.itervalues())
+        total_in = sum(stats["bytes_in"] for stats in snapshot.itervalues())
+        self.assertEquals(self.conn.transport.bytes_written, total_out)
+        self.assertEquals(self.conn.transport.bytes_read, total_in)
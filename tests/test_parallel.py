@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+import unittest
+from contextlib import contextmanager
+from mock import Mock
+
+from pyaccumulo import Accumulo, Cell
+from pyaccumulo.parallel import ParallelScan
+from pyaccumulo.proxy.ttypes import Key, KeyValue, Range, ScanResult
+
+# table contents by tablet, each tablet returns two nextK batches
+TABLETS = {
+    None: [["a1", "a2"], ["a3"]],
+    "m": [["m1"], ["m2", "m3"]],
+    "t": [["t1", "t2"], []],
+}
+
+class FakePool(object):
+    max_size = 3
+
+    def __init__(self, fail_tablet="none"):
+        self.fail_tablet = fail_tablet
+        self.lock = threading.Lock()
+        self.closed = []
+        self.created = []
+
+    def _client(self):
+        client = Mock()
+        client.splitRangeByTablets = Mock(return_value=[Range(start=Key(row="t")), Range(), Range(start=Key(row="m"))])
+        batches = {}
+
+        def create_scanner(login, table, options):
+            tablet = options.range.start.row if options.range.start else None
+            batches[tablet] = list(TABLETS[tablet])
+            with self.lock:
+                self.created.append(tablet)
+            return tablet
+
+        def next_k(scanner, k):
+            if scanner == self.fail_tablet:
+                raise ValueError("scan failed")
+            rows = batches[scanner].pop(0)
+            return ScanResult(results=[KeyValue(Key(row=r), "v") for r in rows], more=len(batches[scanner]) > 0)
+
+        def close_scanner(scanner):
+            with self.lock:
+                self.closed.append(scanner)
+
+        client.createScanner.side_effect = create_scanner
+        client.nextK.side_effect = next_k
+        client.closeScanner.side_effect = close_scanner
+        return client
+
+    @contextmanager
+    def connection(self):
+        conn = Accumulo(_connect=False)
+        conn.login = "Login"
+        conn.client = self._client()
+        yield conn
+
+class ParallelScanTest(unittest.TestCase):
+    def test_ordered(self):
+        pool = FakePool()
+        rows = [c.row for c in ParallelScan(pool, "mytable", batchsize=2)]
+        self.assertEquals(["a1", "a2", "a3", "m1", "m2", "m3", "t1", "t2"], rows)
+        self.assertEquals(set([None, "m", "t"]), set(pool.closed))
+
+    def test_unordered(self):
+        pool = FakePool()
+        rows = [c.row for c in ParallelScan(pool, "mytable", ordered=False)]
+        self.assertEquals(["a1", "a2", "a3", "m1", "m2", "m3", "t1", "t2"], sorted(rows))
+
+    def test_batches(self):
+        batches = list(ParallelScan(FakePool(), "mytable", threads=1).batches())
+        self.assertEquals([Cell("a1", None, None, None, None, "v"), Cell("a2", None, None, None, None, "v")], batches[0])
+        self.assertEquals(5, len(batches))
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            list(ParallelScan(FakePool(fail_tablet="m"), "mytable"))
+
+    def test_early_close(self):
+        pool = FakePool()
+        scan = iter(ParallelScan(pool, "mytable", depth=1))
+        self.assertEquals("a1", next(scan).row)
+        scan.close()
+
+        # a worker stops taking pieces once the scan is abandoned
+        pool = FakePool()
+        scan = iter(ParallelScan(pool, "mytable", depth=1, threads=1))
+        self.assertEquals("a1", next(scan).row)
+        scan.close()
+        self.assertEquals([None], pool.created)
+        self.assertEquals([None], pool.closed)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import socket
+import threading
+import unittest
+from mock import Mock, patch
+
+from thrift.transport.TTransport import TTransportException
+from pyaccumulo.pool import AccumuloPool
+
+
+class AccumuloPoolTest(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("pyaccumulo.pool.Accumulo", side_effect=lambda **kwargs: Mock(kwargs=kwargs))
+        self.accumulo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_put_reuses_connection(self):
+        pool = AccumuloPool(max_size=2, host="proxy1", port=1234)
+        conn = pool.get()
+        self.assertEquals({"host": "proxy1", "port": 1234}, conn.kwargs)
+        pool.put(conn)
+        self.assertEquals((1, 1), pool.size())
+        self.assertIs(conn, pool.get())
+        self.assertEquals(1, self.accumulo.call_count)
+
+    def test_get_times_out_when_full(self):
+        pool = AccumuloPool(max_size=1)
+        pool.get()
+        with self.assertRaises(Exception):
+            pool.get(timeout=0.01)
+
+    def test_get_waits_for_put(self):
+        pool = AccumuloPool(max_size=1)
+        conn = pool.get()
+        t = threading.Timer(0.05, pool.put, [conn])
+        t.start()
+        self.assertIs(conn, pool.get(timeout=5))
+        t.join()
+
+    def test_idle_eviction(self):
+        pool = AccumuloPool(idle_timeout=-1)
+        conn = pool.get()
+        pool.put(conn)
+        conn2 = pool.get()
+        self.assertIsNot(conn, conn2)
+        conn.close.assert_called_with()
+        self.assertEquals((1, 0), pool.size())
+
+    def test_health_check(self):
+        health_check = Mock(side_effect=Exception("dead"))
+        pool = AccumuloPool(check_interval=-1, health_check=health_check)
+        conn = pool.get()
+        pool.put(conn)
+        conn2 = pool.get()
+        health_check.assert_called_with(conn)
+        conn.close.assert_called_with()
+        self.assertIsNot(conn, conn2)
+        self.assertEquals((1, 0), pool.size())
+
+    def test_connection_discards_broken_transport(self):
+        pool = AccumuloPool()
+        with self.assertRaises(TTransportException):
+            with pool.connection() as conn:
+                raise TTransportException()
+        conn.close.assert_called_with()
+        self.assertEquals((0, 0), pool.size())
+
+        with pool.connection() as conn:
+            pass
+        self.assertEquals((1, 1), pool.size())
+
+    def test_connection_discards_broken_socket(self):
+        pool = AccumuloPool()
+        with self.assertRaises(socket.error):
+            with pool.connection() as conn:
+                raise socket.error(32, "Broken pipe")
+        conn.close.assert_called_with()
+        self.assertEquals((0, 0), pool.size())
+        self.assertIsNot(conn, pool.get())
+
+    def test_close(self):
+        pool = AccumuloPool()
+        conn = pool.get()
+        pool.put(conn)
+        pool.close()
+        conn.close.assert_called_with()
+        with self.assertRaises(Exception):
+            pool.get()